@@ -1,42 +1,194 @@
-from flask import Flask, request, render_template, redirect, url_for, session, jsonify
+from flask import Flask, Response, g, has_request_context, request, render_template, redirect, url_for, session, jsonify, make_response
 import numpy as np
-import pickle
+import csv
+import hashlib
+import hmac
+import io
+import json
 import logging
 import os
 import sqlite3
+import threading
+import time
 import re
-import requests
-from datetime import datetime
+from datetime import datetime, timezone
 from functools import wraps
+from assets import AssetManifest
+from cache import PredictionCache, parse_precision
+from db import ConnectionPool
+from envelopes import MAX, MIN, load_envelopes
+from inference import FEATURES, crop_dict
+from limits import MemoryBackend, RateLimiter, RedisBackend, parse_limit
+from metrics import registry, timed
+from models import ModelError, ModelRegistry
+from similarity import SimilarityIndex
+from weather import WeatherClient, WeatherError, WeatherOverloaded
+from whatif import parse_axes, sweep
 
-logging.basicConfig(level=logging.DEBUG)
+# INFO by default; per-prediction detail is logged at DEBUG with lazy formatting
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper())
 
 base_dir = os.path.dirname(os.path.abspath(__file__))
 
-model = pickle.load(open(os.path.join(base_dir, 'model.pkl'), 'rb'))
-sc = pickle.load(open(os.path.join(base_dir, 'standscaler.pkl'), 'rb'))
-ms = pickle.load(open(os.path.join(base_dir, 'minmaxscaler.pkl'), 'rb'))
+# Flattened forest written by `python inference.py build`; memory-mapped so forked
+# workers share it. Falls back to the pickles when the bundle is missing or stale.
+MODEL_BUNDLE_DIR = os.environ.get('MODEL_BUNDLE_DIR', os.path.join(base_dir, 'model_bundle'))
+
+# Per-crop feature quantiles for input checks and explanations, precomputed into
+# the bundle by `python envelopes.py`; a few KB, so loaded eagerly
+crop_envelopes = load_envelopes(MODEL_BUNDLE_DIR, os.path.join(base_dir, 'Crop_recommendation.csv'))
+
+# Seconds between checks of the model files for a new version; 0 disables the
+# watcher and leaves POST /admin/reload_model (with MODEL_ADMIN_TOKEN) to reload
+MODEL_WATCH_INTERVAL = float(os.environ.get('MODEL_WATCH_INTERVAL', 0))
+MODEL_ADMIN_TOKEN = os.environ.get('MODEL_ADMIN_TOKEN')
+
+# New versions must still label every crop's median sample correctly
+model_registry = ModelRegistry(base_dir, MODEL_BUNDLE_DIR, probe=crop_envelopes.medians(),
+                               interval=MODEL_WATCH_INTERVAL)
+
+def get_engine():
+    """The active engine, loaded on first use so non-model pages never wait for it."""
+    model = model_registry.current()
+    if has_request_context():
+        g.model_version = model.version
+    return model.engine
+
+# Samples searched by /similar; point at a larger regional CSV with the same columns
+SIMILARITY_DATA = os.environ.get('SIMILARITY_DATA', os.path.join(base_dir, 'Crop_recommendation.csv'))
+
+# Most neighbours /similar returns per row
+MAX_NEIGHBOURS = 50
+
+_similarity_index = None
+_similarity_lock = threading.Lock()
+
+def get_similarity_index():
+    """Build the KD-tree over SIMILARITY_DATA once, on first use."""
+    global _similarity_index
+    if _similarity_index is None:
+        with _similarity_lock:
+            if _similarity_index is None:
+                _similarity_index = SimilarityIndex.from_csv(SIMILARITY_DATA, get_engine())
+    return _similarity_index
+
+# Repeated inputs (lab reports round N/P/K and pH) skip the forest entirely.
+# PREDICTION_CACHE_SIZE=0 disables the cache; PREDICTION_CACHE_PRECISION is one
+# decimal count for all features or a comma-separated list in FEATURES order.
+prediction_cache = PredictionCache(
+    maxsize=int(os.environ.get('PREDICTION_CACHE_SIZE', 4096)),
+    precision=parse_precision(os.environ.get('PREDICTION_CACHE_PRECISION', '2')),
+)
+
+# Rows per chunk when streaming batch results back to the client
+BATCH_STREAM_CHUNK = 1000
+
+# Most rows one request may carry; bulk jobs belong in score_cli.py
+MAX_BATCH_ROWS = int(os.environ.get('MAX_BATCH_ROWS', 100_000))
+
+# Default number of ranked crops shown by /predict
+DEFAULT_TOP_K = 3
+
+def load_crop_details(path):
+    """Load the crop knowledge base and split each numbered content string into its points."""
+    with open(path, encoding='utf-8') as f:
+        details = json.load(f)
+    for crop in details.values():
+        for detail in crop['details']:
+            detail['content'] = re.split(r'\d+\.\s', detail['content'])[1:]
+    return details
+
+crop_details_path = os.path.join(base_dir, 'crop_details.json')
+crop_details = load_crop_details(crop_details_path)
+crop_details_mtime = datetime.fromtimestamp(int(os.path.getmtime(crop_details_path)), timezone.utc)
+
+# Rendered crop_info.html and its ETag per crop; the page only depends on crop_details
+crop_info_pages = {}
+
+# Shared Open-Meteo client; upstream URLs, TTLs and timeouts come from the environment
+weather_client = WeatherClient()
+
+# Fingerprinted copies written by `python assets.py`; without them the originals in
+# static/ are served. Crop images are looked up here, whatever the file name's case.
+assets = AssetManifest(os.path.join(base_dir, 'static'))
+
+# Hashed asset URLs change whenever the content does, so browsers may keep them a year
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+# Token buckets per logged-in user, or per IP address for anonymous clients, as
+# RATE_LIMIT_<GROUP>="requests per second,burst"; 0 turns a group's limit off.
+# Buckets live in this process unless RATE_LIMIT_REDIS_URL shares them.
+RATE_LIMITS = {
+    'predict': parse_limit(os.environ.get('RATE_LIMIT_PREDICT', '10,30')),
+    'batch': parse_limit(os.environ.get('RATE_LIMIT_BATCH', '1,5')),
+    'weather': parse_limit(os.environ.get('RATE_LIMIT_WEATHER', '2,10')),
+}
+RATE_LIMIT_REDIS_URL = os.environ.get('RATE_LIMIT_REDIS_URL')
+rate_limiter = RateLimiter(RedisBackend(RATE_LIMIT_REDIS_URL) if RATE_LIMIT_REDIS_URL else MemoryBackend())
 
 # app
 app = Flask(__name__, template_folder=base_dir)
 app.secret_key = 'your_secret_key'
+# Larger bodies are refused with 413 before they are read
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_REQUEST_BYTES', 16 * 1024 * 1024))
+
+def asset_url(name):
+    return url_for('static', filename=assets.path(name))
+
+def asset_srcset(name):
+    """srcset of the WebP variants of an image, or '' when the assets haven't been built."""
+    return ', '.join(f"{url_for('static', filename=path)} {width}w" for path, width in assets.webp(name))
 
-def init_db():
-    conn = sqlite3.connect(os.path.join(base_dir, 'users.db'))
-    cursor = conn.cursor()
-    cursor.execute('''CREATE TABLE IF NOT EXISTS users (
+app.jinja_env.globals.update(asset_url=asset_url, asset_srcset=asset_srcset)
+
+# Clients may send "X-Profile: 1" to get the request's stage timings back in a
+# Server-Timing header; set PROFILE_HEADER=0 to ignore it
+PROFILE_HEADER = os.environ.get('PROFILE_HEADER', '1') == '1'
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    if PROFILE_HEADER and request.headers.get('X-Profile') == '1':
+        g.profile = []
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.endpoint or 'unknown'
+    if 'request_start' in g:
+        elapsed = time.perf_counter() - g.request_start
+        registry.histogram('crop_request_seconds', 'Request latency by endpoint.', endpoint=endpoint).observe(elapsed)
+        if g.get('profile') is not None:
+            stages = [f"{stage};dur={seconds * 1e3:.3f}" for stage, seconds in g.profile]
+            stages.append(f"total;dur={elapsed * 1e3:.3f}")
+            response.headers['Server-Timing'] = ', '.join(stages)
+    if request.endpoint == 'static' and assets.is_fingerprinted(request.path):
+        response.cache_control.no_cache = False
+        response.cache_control.public = True
+        response.cache_control.max_age = ASSET_MAX_AGE
+        response.cache_control.immutable = True
+    if 'model_version' in g:
+        response.headers['X-Model-Version'] = g.model_version
+    registry.inc('crop_requests_total', 'Requests by endpoint and status.', endpoint=endpoint, status=response.status_code)
+    return response
+
+def render(template_name, **context):
+    with timed('render'):
+        return render_template(template_name, **context)
+
+def init_db(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS users (
                         id INTEGER PRIMARY KEY AUTOINCREMENT,
                         username TEXT NOT NULL UNIQUE,
                         password TEXT NOT NULL)''')
     conn.commit()
-    conn.close()
-
-init_db()
 
-def get_db_connection():
-    conn = sqlite3.connect(os.path.join(base_dir, 'users.db'), timeout=30)  # Increase timeout to 30 seconds
-    conn.execute('PRAGMA journal_mode=WAL')  # Enable WAL mode
-    return conn
+# One pool per worker process; the schema is created on the first checkout.
+# username is UNIQUE, so SQLite already keeps an index for the login lookup.
+db_pool = ConnectionPool(
+    os.environ.get('USERS_DB', os.path.join(base_dir, 'users.db')),
+    size=int(os.environ.get('DB_POOL_SIZE', 8)),
+    setup=init_db,
+)
 
 def login_required(f):
     @wraps(f)
@@ -46,15 +198,52 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def count_rejected(reason):
+    registry.inc('crop_rejected_requests_total', 'Requests turned away by rate limits, size limits or load shedding.',
+                 endpoint=request.endpoint or 'unknown', reason=reason)
+
+def reject(reason, message, status, retry_after):
+    count_rejected(reason)
+    response = jsonify(success=False, message=message)
+    response.status_code = status
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+@app.errorhandler(413)
+def request_too_large(e):
+    count_rejected('too_large')
+    return jsonify(success=False, message=f"Request bodies are limited to {app.config['MAX_CONTENT_LENGTH']} bytes; "
+                                          f"score larger files offline with score_cli.py"), 413
+
+def rate_limited(group, page=None):
+    """Reject requests over the group's RATE_LIMITS entry with 429 and a Retry-After.
+
+    The rejection is JSON unless ``page`` is given: a function of the message
+    returning the HTML to show, for routes that serve forms.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            limit = RATE_LIMITS.get(group)
+            if limit is not None:
+                client = f"user:{session['user_id']}" if 'user_id' in session else f"ip:{request.remote_addr}"
+                retry_after = rate_limiter.check(f"{group}:{client}", limit)
+                if retry_after:
+                    message = 'Too many requests, please slow down'
+                    if page is None:
+                        return reject('rate_limit', message, 429, retry_after)
+                    count_rejected('rate_limit')
+                    return page(message), 429, {'Retry-After': str(retry_after)}
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
 @app.route('/reset_db')
 @login_required
 def reset_db():
-    conn = sqlite3.connect(os.path.join(base_dir, 'users.db'))
-    cursor = conn.cursor()
-    cursor.execute('DROP TABLE IF EXISTS users')
-    conn.commit()
-    conn.close()
-    init_db()
+    with timed('db_query'), db_pool.connection() as conn:
+        conn.execute('DROP TABLE IF EXISTS users')
+        init_db(conn)
     return 'Database reset and reinitialized'
 
 @app.route('/')
@@ -66,22 +255,16 @@ def login():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM users WHERE username = ?', (username,))
-        user = cursor.fetchone()
-        if user:
-            cursor.execute('SELECT * FROM users WHERE username = ? AND password = ?', (username, password))
-            user = cursor.fetchone()
-            conn.close()
-            if user:
-                session['username'] = username
-                return jsonify(success=True)
-            else:
-                return jsonify(success=False, message='Incorrect password')
-        else:
-            conn.close()
+        with timed('db_query'), db_pool.connection() as conn:
+            user = conn.execute('SELECT id, password FROM users WHERE username = ?', (username,)).fetchone()
+        if user is None:
             return jsonify(success=False, message='User not found, please register')
+        if not hmac.compare_digest(user[1].encode('utf-8'), password.encode('utf-8')):
+            return jsonify(success=False, message='Incorrect password')
+        # login_required only reads the signed session cookie, never the database
+        session['username'] = username
+        session['user_id'] = user[0]
+        return jsonify(success=True)
     return render_template('login.html')
 
 @app.route('/register', methods=['GET', 'POST'])
@@ -89,20 +272,18 @@ def register():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
-        conn = get_db_connection()
-        cursor = conn.cursor()
         try:
-            cursor.execute('INSERT INTO users (username, password) VALUES (?, ?)', (username, password))
-            conn.commit()
+            with timed('db_query'), db_pool.connection() as conn:
+                conn.execute('INSERT INTO users (username, password) VALUES (?, ?)', (username, password))
         except sqlite3.IntegrityError:
             return 'Username already exists'
-        conn.close()
         return redirect(url_for('login'))
     return render_template('register.html')
 
 @app.route('/logout')
 def logout():
     session.pop('username', None)
+    session.pop('user_id', None)
     return redirect(url_for('index'))
 
 @app.route('/index')
@@ -114,373 +295,384 @@ def index():
 def crop_prediction():
     return render_template('crop_pred.html', username=session['username'])
 
+def rank_matrix(features, k):
+    """Return the top-k labels and vote fractions for every row, from the same single forest pass.
+
+    Rows whose quantized inputs are cached skip the forest; the rest are scored together.
+    """
+    # Read before the engine: a model swap in between clears the cache and the put is dropped
+    generation = prediction_cache.generation
+    engine = get_engine()
+    with timed('cache_lookup'):
+        keys = prediction_cache.keys_for(features)
+        rows = prediction_cache.get_many(keys)
+        missing = [i for i, row in enumerate(rows) if row is None]
+    if missing:
+        with timed('scale'):
+            scaled = engine.transform(features[missing])
+        with timed('forest'):
+            proba = engine.predict_proba_scaled(scaled)
+        computed = [row.copy() for row in proba]
+        prediction_cache.put_many([keys[i] for i in missing], computed, generation=generation)
+        for i, row in zip(missing, computed):
+            rows[i] = row
+    with timed('rank'):
+        return engine.rank(np.vstack(rows), k)
+
+def check_inputs(feature_list, label):
+    """Out-of-range warnings for one input row and how it compares with the predicted crop."""
+    with timed('envelope'):
+        for name, flagged in zip(FEATURES, crop_envelopes.out_of_range(feature_list)[0]):
+            if flagged:
+                registry.inc('crop_out_of_range_inputs_total', 'Inputs outside the training data range.', feature=name)
+        warnings = crop_envelopes.warnings(feature_list)
+        explanation = crop_envelopes.explain(feature_list, label) if label in crop_dict else []
+    return warnings, explanation
+
+def parse_top_k(value, default):
+    if value in (None, ''):
+        return default
+    k = int(value)
+    if k < 1:
+        raise ValueError("top_k and k must be positive integers")
+    return k
+
+class BatchTooLarge(ValueError):
+    pass
+
+def parse_batch_rows(rows):
+    """Turn a list of 7-value lists or of dicts keyed by FEATURES into an (n, 7) float matrix."""
+    if not isinstance(rows, list) or not rows:
+        raise ValueError("Expected a non-empty list of rows")
+    if len(rows) > MAX_BATCH_ROWS:
+        raise BatchTooLarge(f"A request may carry at most {MAX_BATCH_ROWS} rows; "
+                            f"score larger files offline with score_cli.py")
+    rows = [[row[name] for name in FEATURES] if isinstance(row, dict) else row for row in rows]
+    features = np.asarray(rows, dtype=np.float64)
+    if features.ndim != 2 or features.shape[1] != len(FEATURES):
+        raise ValueError(f"Each row must have {len(FEATURES)} values: {', '.join(FEATURES)}")
+    if not np.isfinite(features).all():
+        raise ValueError("Every value must be a finite number")
+    return features
+
+def read_batch_request():
+    """Read the batch rows and requested top_k from a JSON body, a CSV body or an uploaded CSV file."""
+    top_k = request.args.get('top_k')
+    if 'file' in request.files:
+        text = request.files['file'].read().decode('utf-8')
+        top_k = request.form.get('top_k', top_k)
+        return parse_batch_rows(list(csv.DictReader(io.StringIO(text)))), parse_top_k(top_k, 1), 'csv'
+    if request.mimetype == 'text/csv':
+        text = request.get_data(as_text=True)
+        return parse_batch_rows(list(csv.DictReader(io.StringIO(text)))), parse_top_k(top_k, 1), 'csv'
+    payload = request.get_json(silent=True)
+    if isinstance(payload, dict):
+        top_k = payload.get('top_k', top_k)
+        payload = payload.get('rows')
+    return parse_batch_rows(payload), parse_top_k(top_k, 1), 'json'
+
+def stream_batch_labels(labels, proba, fmt):
+    """Yield the ranked labels as CSV lines or NDJSON records, a chunk at a time."""
+    k = labels.shape[1]
+    if fmt == 'csv':
+        header = ['row', 'label', 'crop']
+        if k > 1:
+            header = ['row'] + [f"{name}_{rank}" for rank in range(1, k + 1) for name in ('label', 'crop', 'probability')]
+        yield ','.join(header) + '\n'
+    for start in range(0, len(labels), BATCH_STREAM_CHUNK):
+        lines = []
+        rows = zip(labels[start:start + BATCH_STREAM_CHUNK].tolist(), proba[start:start + BATCH_STREAM_CHUNK].tolist())
+        for i, (row_labels, row_proba) in enumerate(rows, start=start):
+            if fmt == 'csv':
+                if k == 1:
+                    fields = [i, row_labels[0], crop_dict.get(row_labels[0], "Unknown")]
+                else:
+                    fields = [i]
+                    for label, p in zip(row_labels, row_proba):
+                        fields += [label, crop_dict.get(label, "Unknown"), round(p, 4)]
+                lines.append(','.join(map(str, fields)) + '\n')
+            else:
+                record = {'row': i, 'label': row_labels[0], 'crop': crop_dict.get(row_labels[0], "Unknown")}
+                if k > 1:
+                    record['top'] = [{'label': label, 'crop': crop_dict.get(label, "Unknown"), 'probability': round(p, 4)}
+                                     for label, p in zip(row_labels, row_proba)]
+                lines.append(json.dumps(record) + '\n')
+        yield ''.join(lines)
+
+@app.route('/predict_batch', methods=['POST'])
+@login_required
+@rate_limited('batch')
+def predict_batch():
+    try:
+        with timed('form_parse'):
+            features, top_k, fmt = read_batch_request()
+        # Values that only overflow once scaled to float32 are rejected here
+        labels, proba = rank_matrix(features, top_k)
+    except BatchTooLarge as e:
+        count_rejected('too_large')
+        return jsonify(success=False, message=str(e)), 413
+    except (ValueError, KeyError, TypeError, UnicodeDecodeError) as e:
+        return jsonify(success=False, message=str(e)), 400
+    logging.debug("Batch prediction for %d rows", len(labels))
+
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return Response(stream_batch_labels(labels, proba, fmt), mimetype=mimetype)
+
+@app.route('/similar', methods=['POST'])
+@login_required
+@rate_limited('predict')
+def similar():
+    payload = request.get_json(silent=True)
+    try:
+        if not isinstance(payload, dict):
+            raise ValueError("Expected a JSON object with 'rows' or 'row'")
+        rows = payload['rows'] if 'rows' in payload else [payload.get('row')]
+        features = parse_batch_rows(rows)
+        k = min(parse_top_k(payload.get('k', request.args.get('k')), 5), MAX_NEIGHBOURS)
+        index = get_similarity_index()
+        with timed('similarity'):
+            neighbours = index.neighbours(features, k)
+    except BatchTooLarge as e:
+        count_rejected('too_large')
+        return jsonify(success=False, message=str(e)), 413
+    except (ValueError, KeyError, TypeError) as e:
+        return jsonify(success=False, message=str(e)), 400
+    return jsonify(success=True, k=k, results=neighbours)
+
+@app.route('/what_if', methods=['POST'])
+@login_required
+@rate_limited('predict')
+def what_if():
+    payload = request.get_json(silent=True)
+    try:
+        if not isinstance(payload, dict):
+            raise ValueError("Expected a JSON object with 'row' and 'sweep'")
+        base = parse_batch_rows([payload.get('row')])[0]
+        # Unbounded sides of a sweep default to the range seen in the dataset
+        axes = parse_axes(payload.get('sweep'), crop_envelopes.table[0, [MIN, MAX]])
+        with timed('what_if'):
+            result = sweep(get_engine(), base, axes, payload.get('target'))
+    except (ValueError, KeyError, TypeError) as e:
+        return jsonify(success=False, message=str(e)), 400
+    return jsonify(success=True, **result)
+
+@app.route('/cache_stats')
+def cache_stats():
+    return jsonify(prediction_cache.stats())
+
 @app.route("/predict", methods=['POST'])
+@login_required
+@rate_limited('predict', page=lambda message: render('crop_pred.html', result=message, crop_image='default.jpg'))
 def predict():
     try:
-        N = float(request.form['Nitrogen'])
-        P = float(request.form['Phosporus'])
-        K = float(request.form['Potassium'])
-        ph = float(request.form['Ph'])
-        rainfall = float(request.form['Rainfall'])
-        temp = float(request.form['Temperature'])
-        humidity = float(request.form['Humidity'])
+        with timed('form_parse'):
+            N = float(request.form['Nitrogen'])
+            P = float(request.form['Phosporus'])
+            K = float(request.form['Potassium'])
+            ph = float(request.form['Ph'])
+            rainfall = float(request.form['Rainfall'])
+            temp = float(request.form['Temperature'])
+            humidity = float(request.form['Humidity'])
+            top_k = parse_top_k(request.form.get('top_k'), DEFAULT_TOP_K)
 
-        logging.debug(f"Received input: N={N}, P={P}, K={K}, temp={temp}, humidity={humidity}, ph={ph}, rainfall={rainfall}")
+        logging.debug("Received input: N=%s, P=%s, K=%s, temp=%s, humidity=%s, ph=%s, rainfall=%s",
+                      N, P, K, temp, humidity, ph, rainfall)
 
-        feature_list = [N, P, K, temp, humidity, ph, rainfall]
-        single_pred = np.array(feature_list).reshape(1, -1)
 
-        scaled_features = ms.transform(single_pred)
-        final_features = sc.transform(scaled_features)
-        prediction = model.predict(final_features)
+        feature_list = [N, P, K, temp, humidity, ph, rainfall]
+        labels, proba = rank_matrix(parse_batch_rows([feature_list]), top_k)
+        prediction = labels[:, 0]
 
-        logging.debug(f"Prediction: {prediction}")
+        logging.debug("Prediction: %s", prediction)
+        warnings, explanation = check_inputs(feature_list, prediction[0])
 
-        crop_dict = {1: "Rice", 2: "Maize", 3: "Jute", 4: "Cotton", 5: "Coconut", 6: "Papaya", 7: "Orange",
-                     8: "Apple", 9: "Muskmelon", 10: "Watermelon", 11: "Grapes", 12: "Mango", 13: "Banana",
-                     14: "Pomegranate", 15: "Lentil", 16: "Blackgram", 17: "Mungbean", 18: "Mothbeans",
-                     19: "Pigeonpeas", 20: "Kidneybeans", 21: "Chickpea", 22: "Coffee"}
+        alternatives = [{'crop': crop_dict[label], 'probability': round(100 * p, 1)}
+                        for label, p in zip(labels[0, 1:].tolist(), proba[0, 1:].tolist())
+                        if label in crop_dict and p > 0]
 
         if prediction[0] in crop_dict:
             crop = crop_dict[prediction[0]]
             result = "{} is the best crop to be cultivated right there".format(crop)
-            crop_image = f"{crop.lower()}.jpg"  
+            crop_image = assets.crop_image(crop)
         else:
             result = "Sorry, we could not determine the best crop to be cultivated with the provided data."
             crop_image = "default.jpg"  
             crop = "default"  
     except Exception as e:
-        logging.error(f"An error occurred: {str(e)}")
+        logging.error("An error occurred: %s", e)
         result = f"An error occurred: {str(e)}"
         crop_image = "default.jpg"  
         crop = "default"  
+        alternatives = []
+        warnings, explanation = [], []
     
-    return render_template('crop_pred.html', result=result, crop_image=crop_image, crop=crop)
+    return render('crop_pred.html', result=result, crop_image=crop_image, crop=crop, alternatives=alternatives,
+                  warnings=warnings, explanation=explanation)
 
 @app.route('/crop_info/<crop>')
 @login_required
 def crop_info(crop):
-    crop_details = {
-        "rice": {
-            "title": "Rice Cultivation",
-            "details": [
-                {"heading": "🌾 Seeds Required", "content": "1. ➢Use high-yielding varieties like IR-64, BPT-5204, or hybrid varieties based on climate. 2. ➢Seed rate: 40-50 kg per hectare (for transplanted) and 80-100 kg per hectare (for direct seeding)."},
-                {"heading": "💊 Fertilizer Requirements", "content": "1. ➢Urea (46% N) – Main nitrogen source. 2. ➢Diammonium Phosphate (DAP) (18% N, 46% P₂O₅) – Provides nitrogen and phosphorus. 3. ➢Muriate of Potash (MOP) (60% K₂O) – Potassium-rich fertilizer. 4. ➢ Apply farmyard manure (10-15 tons/ha) before planting."},
-                {"heading": "🌱 Proper Plantation", "content": "1. ➢Transplanting Method: Nursery raised, seedlings transplanted at 2-3 leaf stage. 20 x 15 cm spacing between plants. 2. ➢Direct Seeding Method: Seeds are directly sown in wet or dry conditions."},
-                {"heading": "👨‍🌾 Proper Methodology to Harvest", "content": "1. ➢Harvest when 80-90% of grains turn golden yellow. 2. ➢Use a sickle or combine harvester. 3. ➢Dry grains to 12-14% moisture before storage."},
-                {"heading": "🌿 Proper Care", "content": "1. <b>Watering:</b> Requires standing water (5-7 cm) during vegetative growth. 2. <b>Weed Control:</b> Apply herbicides like Butachlor or use mechanical weeding. 3. <b>Pest Control:</b> Monitor for stem borers, leafhoppers, and brown planthoppers."},
-                {"heading": "📅 Best Time to Grow", "content": "1. <b>Kharif season</b> (June-July planting, harvested in October-November). 2. <b>Rabi season</b> (November-December planting, harvested in April-May in some regions)."},
-                {"heading": "🚜 When to Cut the Crop", "content": "1. ➢Around 120-150 days after planting, ➢Depending on the variety."}
-            ]
-        },
-        "maize": {
-            "title": "Maize Cultivation",
-            "details": [
-                {"heading": "🌾 Seeds Required", "content": "1. ➢Hybrid varieties like HQPM-1, PIONEER 30V92, or DKC 9125. 2. ➢Seed rate: 18-25 kg per hectare."},
-                {"heading": "💊 Fertilizer Requirements", "content": "1. ➢Urea (46% N) – Essential for nitrogen supply. 2. ➢Diammonium Phosphate (DAP) (18% N, 46% P₂O₅) – Supports root growth. 3. ➢Muriate of Potash (MOP) (60% K₂O) – Boosts grain formation. ➢Apply farmyard manure (10-15 tons/ha) before planting."},
-                {"heading": "🌱 Proper Plantation", "content": "1. ➢Sowing depth: 3-5 cm. 2. ➢Row spacing: 60-75 cm; Plant spacing: 18-25 cm. 3. ➢Sown by dibbling or mechanized planters."},
-                {"heading": "👨‍🌾 Proper Methodology to Harvest", "content": "1. ➢Harvest when cobs are fully mature, dry, and kernels hard. 2. ➢Kernel moisture should be 18-20% at harvest and dried to 12-14% for storage. 3. ➢Use mechanical harvesters or handpicking."},
-                {"heading": "🌿 Proper Care", "content": "1. <b>Watering:</b> Needs irrigation at critical stages—vegetative, flowering, and grain filling. 2. <b>Weed Control:</b> Use herbicides like Atrazine or manual weeding. 3. <b>Pest Control:</b> Watch for Fall Armyworm, stem borer, and cutworms."},
-                {"heading": "📅 Best Time to Grow", "content": "1. <b>Kharif season</b> (June-July sowing, harvested in September-October). 2. <b>Rabi season</b> (October-November sowing, harvested in February-March in some regions)."},
-                {"heading": "🚜 When to Cut the Crop", "content": "1. ➢Around 90-120 days after planting, ➢When kernels are fully matured."}
-            ]
-        },
-         "jute": {
-    "title": "Jute Cultivation",
-    "details": [
-        {"heading": "🌾 Seeds Required", "content": "1. ➢Use high-yielding varieties like JRO-524, JRO-7835, and JRO-8432. 2. ➢Seed rate: 5-6 kg per hectare for capsularis and 4-5 kg per hectare for olitorius species."},
-        {"heading": "💊 Fertilizer Requirements", "content": "1. ➢Urea (46% N) – Supports vegetative growth. 2. ➢Single Super Phosphate (SSP) (16% P₂O₅) – Helps in root and fiber development. 3. ➢Muriate of Potash (MOP) (60% K₂O) – Enhances fiber quality. 4. ➢Apply farmyard manure (10 tons/ha) before sowing."},
-        {"heading": "🌱 Proper Plantation", "content": "1. ➢Sow seeds at a depth of 1-2 cm in well-drained, loamy soil. 2. ➢Row spacing: 25-30 cm for better plant growth. 3. ➢Requires warm, humid conditions for better fiber development."},
-        {"heading": "👨‍🌾 Proper Methodology to Harvest", "content": "1. ➢Harvest when plants start shedding leaves (100-120 days after sowing). 2. ➢Cut plants at the base and bundle them for retting. 3. ➢Ret fibers in water for 2-3 weeks for separation."},
-        {"heading": "🌿 Proper Care", "content": "1. <b>Watering:</b> Requires frequent irrigation in dry areas. 2. <b>Weed Control:</b> Use pre-emergence herbicides like Fluchloralin. 3. <b>Pest Control:</b> Monitor for jute semilooper and stem weevil."},
-        {"heading": "📅 Best Time to Grow", "content": "1. <b>Summer season</b> (March-May sowing, harvested in June-September)."},
-        {"heading": "🚜 When to Cut the Crop", "content": "1. ➢Around 100-120 days after planting, ➢Before flowering for better fiber quality."}
-    ]
-},
-"cotton": {
-    "title": "Cotton Cultivation",
-    "details": [
-        {"heading": "🌾 Seeds Required", "content": "1. ➢Use high-yielding varieties like Bt Cotton (BG-II), Hybrid Cotton (H-4, H-6), or local varieties (Suvin, MCU-5). 2. ➢Seed rate: 2-3 kg per hectare for hybrids, 12-15 kg per hectare for non-hybrids."},
-        {"heading": "💊 Fertilizer Requirements", "content": "1. ➢Urea (46% N) – Provides nitrogen for vegetative growth. 2. ➢Single Super Phosphate (SSP) (16% P₂O₅) – Enhances root and flower development. 3. ➢Muriate of Potash (MOP) (60% K₂O) – Improves fiber quality. 4. ➢Apply farmyard manure (10-15 tons/ha) before planting for better soil health."},
-        {"heading": "🌱 Proper Plantation", "content": "1. ➢Sow seeds at a depth of 2-3 cm in well-prepared loamy soil. 2. ➢Row spacing: 60-90 cm depending on variety. 3. ➢Use ridge and furrow method to ensure proper drainage."},
-        {"heading": "👨‍🌾 Proper Methodology to Harvest", "content": "1. ➢Harvest when cotton bolls fully open (about 150-180 days after sowing). 2. ➢Pick cotton manually or use mechanical pickers. 3. ➢Store in dry conditions to maintain fiber quality."},
-        {"heading": "🌿 Proper Care", "content": "1. <b>Watering:</b> Requires 6-7 irrigations, critical at flowering and boll formation. 2. <b>Weed Control:</b> Use pre-emergence herbicides like Pendimethalin. 3. <b>Pest Control:</b> Monitor for bollworms, aphids, and whiteflies."},
-        {"heading": "📅 Best Time to Grow", "content": "1. <b>Kharif season</b> (April-May sowing, harvested in October-January)."},
-        {"heading": "🚜 When to Cut the Crop", "content": "1. ➢Around 150-180 days after planting, ➢Depending on variety and climate."}
-    ]
-},
-"coconut": {
-    "title": "Coconut Cultivation",
-    "details": [
-        {"heading": "🌾 Seeds Required", "content": "1. ➢Use high-yielding varieties like Dwarf Orange, Tall (West Coast Tall, East Coast Tall), and hybrid varieties (Chowghat Orange Dwarf × West Coast Tall). 2. ➢Seed rate: 175-200 nuts per hectare."},
-        {"heading": "💊 Fertilizer Requirements", "content": "1. ➢Urea (46% N) – Provides nitrogen for growth. 2. ➢Single Super Phosphate (SSP) (16% P₂O₅) – Enhances root and nut formation. 3. ➢Muriate of Potash (MOP) (60% K₂O) – Improves nut size and quality. 4. ➢Apply farmyard manure (25-30 kg per tree annually) for better growth."},
-        {"heading": "🌱 Proper Plantation", "content": "1. ➢Plant in well-drained sandy loam or alluvial soil. 2. ➢Spacing: 7.5 x 7.5 m for tall varieties, 6.5 x 6.5 m for dwarf varieties. 3. ➢Use pit size of 1m x 1m x 1m and fill with compost before planting."},
-        {"heading": "👨‍🌾 Proper Methodology to Harvest", "content": "1. ➢Harvest when coconuts turn brown and have a hard shell (10-12 months after pollination). 2. ➢Use skilled climbers or mechanical coconut harvesters. 3. ➢Harvest tender coconuts for water at 6-7 months old."},
-        {"heading": "🌿 Proper Care", "content": "1. <b>Watering:</b> Requires 30-40 liters per tree per day during dry season. 2. <b>Weed Control:</b> Mulch with coconut husk or organic matter. 3. <b>Pest Control:</b> Monitor for rhinoceros beetle, red palm weevil, and leaf-eating caterpillars."},
-        {"heading": "📅 Best Time to Grow", "content": "1. <b>Planting season:</b> June-July (monsoon planting) or September-October (post-monsoon planting)."},
-        {"heading": "🚜 When to Cut the Crop", "content": "1. ➢Around 10-12 months after pollination, ➢Tender nuts at 6-7 months."}
-    ]
-},
-"papaya": {
-    "title": "Papaya Cultivation",
-    "details": [
-        {"heading": "🌾 Seeds Required", "content": "1. ➢Use high-yielding varieties like Red Lady, Pusa Dwarf, and Solo. 2. ➢Seed rate: 250-300 g per hectare."},
-        {"heading": "💊 Fertilizer Requirements", "content": "1. ➢Urea (46% N) – Supports vegetative growth. 2. ➢Single Super Phosphate (SSP) (16% P₂O₅) – Improves root and fruit development. 3. ➢Muriate of Potash (MOP) (60% K₂O) – Enhances fruit quality. 4. ➢Apply farmyard manure (10-15 kg per plant) before planting."},
-        {"heading": "🌱 Proper Plantation", "content": "1. ➢Plant in well-drained sandy loam soil. 2. ➢Spacing: 1.8 x 1.8 m. 3. ➢Use pits of 50 x 50 x 50 cm filled with compost."},
-        {"heading": "👨‍🌾 Proper Methodology to Harvest", "content": "1. ➢Harvest when fruits turn yellow (5-6 months after flowering). 2. ➢Use a sharp knife to cut fruits carefully. 3. ➢Store at 10-13°C to extend shelf life."},
-        {"heading": "🌿 Proper Care", "content": "1. <b>Watering:</b> Regular irrigation, especially in dry seasons. 2. <b>Weed Control:</b> Manual weeding or mulching. 3. <b>Pest Control:</b> Protect from aphids, mealybugs, and papaya fruit fly."},
-        {"heading": "📅 Best Time to Grow", "content": "1. <b>Planting seasons:</b> June-September or February-March."},
-        {"heading": "🚜 When to Cut the Crop", "content": "1. ➢5-6 months after flowering."}
-    ]
-},
-"orange": {
-    "title": "Orange Cultivation",
-    "details": [
-        {"heading": "🌾 Seeds Required", "content": "1. ➢Use high-yielding varieties like Nagpur Orange, Kinnow, and Valencia. 2. ➢Seed rate: 250-300 g per hectare (for seedlings)."},
-        {"heading": "💊 Fertilizer Requirements", "content": "1. ➢Urea (46% N) – Promotes vegetative growth. 2. ➢Single Super Phosphate (SSP) (16% P₂O₅) – Enhances root development. 3. ➢Muriate of Potash (MOP) (60% K₂O) – Improves fruit size and taste. 4. ➢Apply farmyard manure (15-20 kg per tree) annually."},
-        {"heading": "🌱 Proper Plantation", "content": "1. ➢Plant in well-drained sandy loam soil. 2. ➢Spacing: 6 x 6 m. 3. ➢Use pits of 1m x 1m x 1m filled with compost."},
-        {"heading": "👨‍🌾 Proper Methodology to Harvest", "content": "1. ➢Harvest when fruits turn deep orange (7-8 months after flowering). 2. ➢Handpick or use clippers to avoid damage. 3. ➢Store at 5-8°C for longer shelf life."},
-        {"heading": "🌿 Proper Care", "content": "1. <b>Watering:</b> Requires deep irrigation during dry periods. 2. <b>Weed Control:</b> Use organic mulching. 3. <b>Pest Control:</b> Protect from citrus psylla and fruit flies."},
-        {"heading": "📅 Best Time to Grow", "content": "1. <b>Planting seasons:</b> July-August or February-March."},
-        {"heading": "🚜 When to Cut the Crop", "content": "1. ➢7-8 months after flowering."}
-    ]
-},
-"apple": {
-    "title": "Apple Cultivation",
-    "details": [
-        {"heading": "🌾 Seeds Required", "content": "1. ➢Use high-yielding varieties like Red Delicious, Golden Delicious, and Fuji. 2. ➢Propagation is done using grafted saplings."},
-        {"heading": "💊 Fertilizer Requirements", "content": "1. ➢Urea (46% N) – Essential for growth. 2. ➢Single Super Phosphate (SSP) (16% P₂O₅) – Improves root system. 3. ➢Muriate of Potash (MOP) (60% K₂O) – Enhances fruit color and quality. 4. ➢Apply farmyard manure (20-25 kg per tree) annually."},
-        {"heading": "🌱 Proper Plantation", "content": "1. ➢Plant in well-drained loamy soil in hilly regions. 2. ➢Spacing: 4 x 4 m. 3. ➢Use pits of 1m x 1m x 1m filled with compost."},
-        {"heading": "👨‍🌾 Proper Methodology to Harvest", "content": "1. ➢Harvest when fruits reach full color (120-150 days after flowering). 2. ➢Use hand-picking or mechanical harvesters. 3. ➢Store at 0-4°C to extend shelf life."},
-        {"heading": "🌿 Proper Care", "content": "1. <b>Watering:</b> Requires frequent irrigation in summer. 2. <b>Weed Control:</b> Use mulching to retain soil moisture. 3. <b>Pest Control:</b> Protect from apple scab and codling moth."},
-        {"heading": "📅 Best Time to Grow", "content": "1. <b>Planting season:</b> December-February (winter dormancy)."},
-        {"heading": "🚜 When to Cut the Crop", "content": "1. ➢120-150 days after flowering."}
-    ]
-},
-"muskmelon": {
-    "title": "Muskmelon Cultivation",
-    "details": [
-        {"heading": "🌾 Seeds Required", "content": "1. ➢Use high-yielding varieties like Hara Madhu, Punjab Hybrid, and Arka Jeet. 2. ➢Seed rate: 1.5-2 kg per hectare."},
-        {"heading": "💊 Fertilizer Requirements", "content": "1. ➢Urea (46% N) – Essential for vegetative growth. 2. ➢Single Super Phosphate (SSP) (16% P₂O₅) – Enhances fruit development. 3. ➢Muriate of Potash (MOP) (60% K₂O) – Improves fruit sweetness. 4. ➢Apply farmyard manure (15-20 tons/ha) before planting."},
-        {"heading": "📅 Best Time to Grow", "content": "1. <b>Planting seasons:</b> February-April."}
-    ]
-},
-"watermelon": {
-    "title": "Watermelon Cultivation",
-    "details": [
-        {"heading": "🌾 Seeds Required", "content": "1. ➢Use high-yielding varieties like Sugar Baby, Arka Jyoti, and Kiran. 2. ➢Seed rate: 3-5 kg per hectare."},
-        {"heading": "💊 Fertilizer Requirements", "content": "1. ➢Urea (46% N) – Supports vegetative growth. 2. ➢Single Super Phosphate (SSP) (16% P₂O₅) – Improves fruit set. 3. ➢Muriate of Potash (MOP) (60% K₂O) – Enhances fruit sweetness. 4. ➢Apply farmyard manure (15-20 tons/ha) before planting."},
-        {"heading": "📅 Best Time to Grow", "content": "1. <b>Planting seasons:</b> January-March (summer crop)."}
-    ]
-},
-"lentil": {
-    "title": "Lentil Cultivation",
-    "details": [
-        {"heading": "🌾 Seeds Required", "content": "1. ➢Use high-yielding varieties like L-4076, Pusa Vaibhav, and IPL-316. 2. ➢Seed rate: 30-40 kg per hectare."},
-        {"heading": "💊 Fertilizer Requirements", "content": "1. ➢Urea (46% N) – Boosts nitrogen supply. 2. ➢Single Super Phosphate (SSP) (16% P₂O₅) – Enhances root growth. 3. ➢Muriate of Potash (MOP) (60% K₂O) – Improves seed formation. 4. ➢Apply farmyard manure (5-10 tons/ha) before planting."},
-        {"heading": "🌱 Proper Plantation", "content": "1. ➢Plant in well-drained loamy soil. 2. ➢Spacing: 30 x 10 cm between plants."},
-        {"heading": "👨‍🌾 Proper Methodology to Harvest", "content": "1. ➢Harvest when pods turn yellow and dry. 2. ➢Use sickles or threshing machines. 3. ➢Dry seeds to 10-12% moisture before storage."},
-        {"heading": "🌿 Proper Care", "content": "1. <b>Watering:</b> Requires 2-3 irrigations at flowering and pod filling. 2. <b>Weed Control:</b> Use hand weeding or pre-emergence herbicides. 3. <b>Pest Control:</b> Protect from aphids and pod borers."},
-        {"heading": "📅 Best Time to Grow", "content": "1. <b>Rabi season</b> (October-November planting, harvested in February-March)."},
-        {"heading": "🚜 When to Cut the Crop", "content": "1. ➢110-120 days after planting."}
-    ]
-},
-"blackgram": {
-    "title": "Black Gram (Urad) Cultivation",
-    "details": [
-        {"heading": "🌾 Seeds Required", "content": "1. ➢Use varieties like Pant U-19, T-9, or PDU-1. 2. ➢Seed rate: 20-25 kg per hectare."},
-        {"heading": "💊 Fertilizer Requirements", "content": "1. ➢Urea (46% N) – Provides nitrogen. 2. ➢Single Super Phosphate (SSP) (16% P₂O₅) – Enhances early root growth. 3. ➢Muriate of Potash (MOP) (60% K₂O) – Improves seed setting. 4. ➢Apply farmyard manure (5-10 tons/ha) before planting."},
-        {"heading": "🌱 Proper Plantation", "content": "1. ➢Grows best in sandy loam soil with good drainage. 2. ➢Spacing: 30 x 10 cm between plants."},
-        {"heading": "👨‍🌾 Proper Methodology to Harvest", "content": "1. ➢Harvest when pods turn black and dry. 2. ➢Cut plants and sun-dry before threshing."},
-        {"heading": "🌿 Proper Care", "content": "1. <b>Watering:</b> Requires irrigation at flowering and pod filling stages. 2. <b>Weed Control:</b> Hand weeding at 20-25 days after sowing. 3. <b>Pest Control:</b> Monitor for whiteflies and pod borers."},
-        {"heading": "📅 Best Time to Grow", "content": "1. <b>Kharif season</b> (June-July planting, harvested in October-November)."},
-        {"heading": "🚜 When to Cut the Crop", "content": "1. ➢80-90 days after planting."}
-    ]
-},
-"mungbean": {
-    "title": "Mung Bean (Green Gram) Cultivation",
-    "details": [
-        {"heading": "🌾 Seeds Required", "content": "1. ➢Use varieties like PDM-139, K-851, and SML-668. 2. ➢Seed rate: 15-20 kg per hectare."},
-        {"heading": "💊 Fertilizer Requirements", "content": "1. ➢Urea (46% N) – Needed in small amounts. 2. ➢Single Super Phosphate (SSP) (16% P₂O₅) – Strengthens roots and pod formation. 3. ➢Muriate of Potash (MOP) (60% K₂O) – Enhances seed quality. 4. ➢Apply farmyard manure (5-10 tons/ha) before planting."},
-        {"heading": "🌱 Proper Plantation", "content": "1. ➢Plant in well-drained sandy loam soil. 2. ➢Spacing: 30 x 10 cm between plants."},
-        {"heading": "👨‍🌾 Proper Methodology to Harvest", "content": "1. ➢Harvest when 80% of pods turn yellow. 2. ➢Cut plants and dry before threshing."},
-        {"heading": "🌿 Proper Care", "content": "1. <b>Watering:</b> Requires 1-2 irrigations, especially at flowering. 2. <b>Weed Control:</b> Use pre-emergence herbicides or manual weeding. 3. <b>Pest Control:</b> Protect from thrips and aphids."},
-        {"heading": "📅 Best Time to Grow", "content": "1. <b>Kharif season</b> (June-July planting, harvested in September-October)."},
-        {"heading": "🚜 When to Cut the Crop", "content": "1. ➢60-70 days after planting."}
-    ]
-},
-"mothbean": {
-    "title": "Moth Bean Cultivation",
-    "details": [
-        {"heading": "🌾 Seeds Required", "content": "1. ➢Use high-yielding varieties like RMO-225, RMO-257, and Jadia. 2. ➢Seed rate: 8-10 kg per hectare."},
-        {"heading": "💊 Fertilizer Requirements", "content": "1. ➢Urea (46% N) – Provides nitrogen. 2. ➢Single Super Phosphate (SSP) (16% P₂O₅) – Strengthens root development. 3. ➢Muriate of Potash (MOP) (60% K₂O) – Improves grain filling. 4. ➢Apply farmyard manure (5-8 tons/ha) before planting."},
-        {"heading": "🌱 Proper Plantation", "content": "1. ➢Grows best in sandy and light-textured soils. 2. ➢Spacing: 30 x 10 cm between plants."},
-        {"heading": "👨‍🌾 Proper Methodology to Harvest", "content": "1. ➢Harvest when pods turn brown and dry. 2. ➢Cut plants and sun-dry before threshing."},
-        {"heading": "🌿 Proper Care", "content": "1. <b>Watering:</b> Requires minimal irrigation, mostly rainfed. 2. <b>Weed Control:</b> Weeding at 20-25 days after sowing. 3. <b>Pest Control:</b> Protect from leafhoppers and pod borers."},
-        {"heading": "📅 Best Time to Grow", "content": "1. <b>Kharif season</b> (June-July planting, harvested in September-October)."},
-        {"heading": "🚜 When to Cut the Crop", "content": "1. ➢70-80 days after planting."}
-    ]
-},
-"pigeonpeas": {
-    "title": "Pigeon Pea (Tur/Arhar) Cultivation",
-    "details": [
-        {"heading": "🌾 Seeds Required", "content": "1. ➢Use high-yielding varieties like ICPL-87119, Pusa-9, and UPAS-120. 2. ➢Seed rate: 12-15 kg per hectare."},
-        {"heading": "💊 Fertilizer Requirements", "content": "1. ➢Urea (46% N) – Improves vegetative growth. 2. ➢Single Super Phosphate (SSP) (16% P₂O₅) – Enhances root growth. 3. ➢Muriate of Potash (MOP) (60% K₂O) – Improves grain development. 4. ➢Apply farmyard manure (10-15 tons/ha) before planting."},
-        {"heading": "🌱 Proper Plantation", "content": "1. ➢Prefers well-drained loamy soil with pH 6.5-7.5. 2. ➢Spacing: 75 x 30 cm between plants."},
-        {"heading": "👨‍🌾 Proper Methodology to Harvest", "content": "1. ➢Harvest when pods turn brown and dry. 2. ➢Cut plants and sun-dry before threshing."},
-        {"heading": "🌿 Proper Care", "content": "1. <b>Watering:</b> Requires irrigation at flowering and pod filling. 2. <b>Weed Control:</b> Use pre-emergence herbicides or manual weeding. 3. <b>Pest Control:</b> Protect from pod borers and aphids."},
-        {"heading": "📅 Best Time to Grow", "content": "1. <b>Kharif season</b> (June-July planting, harvested in December-January)."},
-        {"heading": "🚜 When to Cut the Crop", "content": "1. ➢150-180 days after planting."}
-    ]
-},
-"kidneybeans": {
-    "title": "Kidney Bean (Rajma) Cultivation",
-    "details": [
-        {"heading": "🌾 Seeds Required", "content": "1. ➢Use varieties like VL Rajma-125, HUR-15, and PDR-14. 2. ➢Seed rate: 75-100 kg per hectare."},
-        {"heading": "💊 Fertilizer Requirements", "content": "1. ➢Urea (46% N) – Provides nitrogen. 2. ➢Single Super Phosphate (SSP) (16% P₂O₅) – Strengthens root growth. 3. ➢Muriate of Potash (MOP) (60% K₂O) – Enhances grain development. 4. ➢Apply farmyard manure (10-15 tons/ha) before planting."},
-        {"heading": "🌱 Proper Plantation", "content": "1. ➢Prefers cool climate and loamy soil. 2. ➢Spacing: 45 x 10 cm between plants."},
-        {"heading": "👨‍🌾 Proper Methodology to Harvest", "content": "1. ➢Harvest when pods turn yellow and dry. 2. ➢Cut plants and sun-dry before threshing."},
-        {"heading": "🌿 Proper Care", "content": "1. <b>Watering:</b> Requires irrigation at flowering and pod filling stages. 2. <b>Weed Control:</b> Use mechanical weeding or herbicides. 3. <b>Pest Control:</b> Protect from aphids and bean flies."},
-        {"heading": "📅 Best Time to Grow", "content": "1. <b>Rabi season</b> (October-November planting, harvested in February-March)."},
-        {"heading": "🚜 When to Cut the Crop", "content": "1. ➢100-120 days after planting."}
-    ]
-},
-"chickpea": {
-    "title": "Chickpea (Gram) Cultivation",
-    "details": [
-        {"heading": "🌾 Seeds Required", "content": "1. ➢Use varieties like Pusa-256, BG-372, and JG-11. 2. ➢Seed rate: 60-80 kg per hectare."},
-        {"heading": "💊 Fertilizer Requirements", "content": "1. ➢Urea (46% N) – Needed in minimal quantity. 2. ➢Single Super Phosphate (SSP) (16% P₂O₅) – Improves root and pod development. 3. ➢Muriate of Potash (MOP) (60% K₂O) – Enhances grain quality. 4. ➢Apply farmyard manure (8-10 tons/ha) before planting."},
-        {"heading": "🌱 Proper Plantation", "content": "1. ➢Prefers sandy loam soil with good drainage. 2. ➢Spacing: 30 x 10 cm between plants."},
-        {"heading": "👨‍🌾 Proper Methodology to Harvest", "content": "1. ➢Harvest when pods turn yellow and dry. 2. ➢Use sickles or threshing machines."},
-        {"heading": "🌿 Proper Care", "content": "1. <b>Watering:</b> Requires minimal irrigation, only at pod formation stage. 2. <b>Weed Control:</b> Use pre-emergence herbicides or manual weeding. 3. <b>Pest Control:</b> Protect from pod borers and aphids."},
-        {"heading": "📅 Best Time to Grow", "content": "1. <b>Rabi season</b> (October-November planting, harvested in February-March)."},
-        {"heading": "🚜 When to Cut the Crop", "content": "1. ➢120-130 days after planting."}
-    ]
-},
-"coffee": {
-    "title": "Coffee Cultivation",
-    "details": [
-        {"heading": "🌾 Seeds Required", "content": "1. ➢Use high-yielding varieties like Thompson Seedless, Bangalore Blue, Anab-e-Shahi, and Sonaka. 2. ➢Propagation is done using stem cuttings or grafting rather than seeds."},
-        {"heading": "💊 Fertilizer Requirements", "content": "1. ➢Urea (46% N) – Supports vegetative growth. 2. ➢Single Super Phosphate (SSP) (16% P₂O₅) – Improves root and fruit development. 3. ➢Muriate of Potash (MOP) (60% K₂O) – Enhances fruit size and quality. 4. ➢Muriate of Potash (MOP) (60% K₂O) – Enhances fruit size and quality.."},
-        {"heading": "🌱 Proper Plantation", "content": "1. ➢Grows best in well-drained, shaded areas with loamy soil. 2. ➢Spacing: 2.5 x 2.5 m for Arabica and 3 x 3 m for Robusta."},
-        {"heading": "👨‍🌾 Proper Methodology to Harvest", "content": "1. ➢Harvest when coffee cherries turn bright red. 2. ➢Pick manually for better quality. 3. ➢Process using dry or wet methods."},
-        {"heading": "🌿 Proper Care", "content": "1. <b>Watering:</b> Requires irrigation during dry spells. 2. <b>Weed Control:</b> Use mulching and manual weeding. 3. <b>Pest Control:</b> Monitor for coffee berry borer and white stem borer."},
-        {"heading": "📅 Best Time to Grow", "content": "1. <b>Planting season</b> (June-August for Arabica, May-June for Robusta)."},
-        {"heading": "🚜 When to Cut the Crop", "content": "1. ➢Cherries mature in 6-8 months after flowering."}
-    ]
-},  
-
-    "grapes": {
-        "title": "Grape Cultivation",
-        "details": [
-            {"heading": "🌾 Propagation Method", "content": "1. ➞Propagation through cuttings or grafting. 2. ➞Use hardwood cuttings or tissue culture plants for better yield."},
-            {"heading": "💊 Fertilizer Requirements", "content": "1. ➞Urea (46% N) – Supports vegetative growth. 2. ➞Single Super Phosphate (SSP) (16% P₂O₅) – Enhances root and fruit development. 3. ➞Muriate of Potash (MOP) (60% K₂O) – Improves fruit size and sweetness. 4. ➞Apply farmyard manure (10-15 tons/ha) before planting."},
-            {"heading": "🌱 Proper Plantation", "content": "1. ➞Plant in well-drained sandy loam soil with good sunlight. 2. ➞Spacing: 3 x 3 m for proper canopy development. 3. ➞Use trellis or pergola system for vine training."},
-            {"heading": "🧑‍🌾 Proper Methodology to Harvest", "content": "1. ➞Harvest when grapes reach full color and desired sugar content (120-150 days after pruning). 2. ➞Handpick carefully to avoid damage. 3. ➞Store at 0-2°C to extend shelf life."},
-            {"heading": "🌿 Proper Care", "content": "1. <b>Watering:</b> Regular irrigation, especially during fruit set and ripening. 2. <b>Weed Control:</b> Manual weeding or mulching. 3. <b>Pest Control:</b> Protect from mealybugs, thrips, and powdery mildew."},
-            {"heading": "📅 Best Time to Grow", "content": "1. <b>Planting seasons:</b> January-February or June-July."},
-            {"heading": "🚜 When to Cut the Crop", "content": "1. ➞Around 120-150 days after pruning, when sugar content is optimal."}
-        ]
-    },
-    "banana": {
-        "title": "Banana Cultivation",
-        "details": [
-            {"heading": "🌾 Propagation Method", "content": "1. ➞Propagation through suckers or tissue culture plants. 2. ➞Use disease-free plantlets for high yield."},
-            {"heading": "💊 Fertilizer Requirements", "content": "1. ➞Urea (46% N) – Supports vegetative growth. 2. ➞Single Super Phosphate (SSP) (16% P₂O₅) – Improves root and fruit development. 3. ➞Muriate of Potash (MOP) (60% K₂O) – Enhances fruit size and quality. 4. ➞Apply farmyard manure (10-15 kg per plant) before planting."},
-            {"heading": "🌱 Proper Plantation", "content": "1. ➞Plant in well-drained loamy soil with good moisture retention. 2. ➞Spacing: 1.5 x 1.5 m for optimal growth. 3. ➞Plant in pits of 50 x 50 x 50 cm filled with compost."},
-            {"heading": "🧑‍🌾 Proper Methodology to Harvest", "content": "1. ➞Harvest when bananas reach full size and turn light green (9-12 months after planting). 2. ➞Cut bunches carefully using a sharp knife. 3. ➞Store at 13-15°C to extend shelf life."},
-            {"heading": "🌿 Proper Care", "content": "1. <b>Watering:</b> Requires frequent irrigation for continuous growth. 2. <b>Weed Control:</b> Manual weeding or mulching. 3. <b>Pest Control:</b> Monitor for banana weevils and nematodes."},
-            {"heading": "📅 Best Time to Grow", "content": "1. <b>Planting seasons:</b> June-July or October-November."},
-            {"heading": "🚜 When to Cut the Crop", "content": "1. ➞Around 9-12 months after planting, when fingers are well-formed."}
-        ]
-    },
-    "mango": {
-        "title": "Mango Cultivation",
-        "details": [
-            {"heading": "🌾 Propagation Method", "content": "1. ➞Propagation through grafting or air-layering. 2. ➞Use high-yielding varieties like Alphonso, Kesar, or Dasheri."},
-            {"heading": "💊 Fertilizer Requirements", "content": "1. ➞Urea (46% N) – Supports vegetative growth. 2. ➞Single Super Phosphate (SSP) (16% P₂O₅) – Enhances root and flower development. 3. ➞Muriate of Potash (MOP) (60% K₂O) – Improves fruit quality. 4. ➞Apply farmyard manure (25-30 kg per tree annually)."},
-            {"heading": "🌱 Proper Plantation", "content": "1. ➞Plant in well-drained loamy soil with proper sunlight. 2. ➞Spacing: 8 x 8 m for good canopy growth. 3. ➞Use pits of 1m x 1m x 1m filled with compost before planting."},
-            {"heading": "🧑‍🌾 Proper Methodology to Harvest", "content": "1. ➞Harvest when fruits develop full color and aroma (100-150 days after flowering). 2. ➞Handpick or use clippers to prevent damage. 3. ➞Store at 12-15°C to extend shelf life."},
-            {"heading": "🌿 Proper Care", "content": "1. <b>Watering:</b> Deep irrigation required during flowering and fruiting. 2. <b>Weed Control:</b> Use organic mulching. 3. <b>Pest Control:</b> Protect from mango hoppers and fruit flies."},
-            {"heading": "📅 Best Time to Grow", "content": "1. <b>Planting seasons:</b> June-July or February-March."},
-            {"heading": "🚜 When to Cut the Crop", "content": "1. ➞Around 100-150 days after flowering, when fully matured."}
-        ]
-    }
-}
-    if crop.lower() in crop_details:
-        crop_info = crop_details[crop.lower()]
-        for detail in crop_info['details']:
-            detail['content'] = re.split(r'\d+\.\s', detail['content'])[1:]  
-        return render_template('crop_info.html', crop=crop_info, crop_image=f"{crop.lower()}.jpg")
-    else:
+    key = crop.lower()
+    if key not in crop_details:
         return "Crop information not available", 404
 
+    cached = crop_info_pages.get(key)
+    if cached is None:
+        html = render('crop_info.html', crop=crop_details[key], crop_image=assets.crop_image(key))
+        cached = (html, hashlib.sha256(html.encode('utf-8')).hexdigest()[:32])
+        crop_info_pages[key] = cached
+
+    html, etag = cached
+    response = make_response(html)
+    response.set_etag(etag)
+    response.last_modified = crop_details_mtime
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
 @app.route('/weather', methods=['GET', 'POST'])
 @login_required
 def weather():
     if request.method == 'POST':
-        city = request.form['city']
-        geocode_url = f'https://geocoding-api.open-meteo.com/v1/search?name={city}'
-        geocode_response = requests.get(geocode_url)
-        geocode_data = geocode_response.json()
-
-        if geocode_response.status_code == 200 and 'results' in geocode_data:
-            latitude = geocode_data['results'][0]['latitude']
-            longitude = geocode_data['results'][0]['longitude']
-
-            weather_url = f'https://api.open-meteo.com/v1/forecast?latitude={latitude}&longitude={longitude}&daily=temperature_2m_max,temperature_2m_min,precipitation_sum,weathercode&timezone=auto&days=14'
-            response = requests.get(weather_url)
-            data = response.json()
-
-            weather_codes = {
-                0: "Clear sky ☀️",
-                1: "Mainly clear 🌤️",
-                2: "Partly cloudy ⛅",
-                3: "Overcast ☁️",
-                45: "Fog 🌫️",
-                48: "Depositing rime fog 🌫️",
-                51: "Light drizzle 🌦️",
-                53: "Moderate drizzle 🌦️",
-                55: "Dense drizzle 🌧️",
-                56: "Light freezing drizzle 🌧️",
-                57: "Dense freezing drizzle 🌧️",
-                61: "Slight rain 🌧️",
-                63: "Moderate rain 🌧️",
-                65: "Heavy rain 🌧️",
-                66: "Light freezing rain 🌧️",
-                67: "Heavy freezing rain 🌧️",
-                71: "Slight snow fall 🌨️",
-                73: "Moderate snow fall 🌨️",
-                75: "Heavy snow fall 🌨️",
-                77: "Snow grains 🌨️",
-                80: "Slight rain showers 🌧️",
-                81: "Moderate rain showers 🌧️",
-                82: "Violent rain showers 🌧️",
-                85: "Slight snow showers 🌨️",
-                86: "Heavy snow showers 🌨️",
-                95: "Thunderstorm ⛈️",
-                96: "Thunderstorm with slight hail ⛈️",
-                99: "Thunderstorm with heavy hail ⛈️"
-            }
-
-            if response.status_code == 200:
-                weather_data = []
-                for i in range(len(data['daily']['time'])):
-                    weather_data.append({
-                        'date': data['daily']['time'][i],
-                        'min_temp': data['daily']['temperature_2m_min'][i],
-                        'max_temp': data['daily']['temperature_2m_max'][i],
-                        'rainfall': data['daily']['precipitation_sum'][i],
-                        'description': weather_codes.get(data['daily']['weathercode'][i], "Unknown")
-                    })
-                return render_template('weather_report.html', weather_data=weather_data, city=city)
-            else:
-                error_message = data.get('reason', 'An error occurred while fetching the weather data.')
-                return render_template('weather_report.html', error_message=error_message)
-        else:
-            error_message = 'An error occurred while fetching the geocode data.'
-            return render_template('weather_report.html', error_message=error_message)
+        return weather_report()
     return render_template('weather_report.html')
 
+@rate_limited('weather', page=lambda message: render('weather_report.html', error_message=message))
+def weather_report():
+    city = request.form['city']
+    try:
+        weather_data = weather_client.report(city)
+    except WeatherOverloaded as e:
+        count_rejected('overload')
+        return render('weather_report.html', error_message=str(e)), 503, {'Retry-After': '1'}
+    except WeatherError as e:
+        return render('weather_report.html', error_message=str(e))
+    return render('weather_report.html', weather_data=weather_data, city=city)
+
+# Soil inputs for /recommend_by_weather: JSON uses the dataset column, forms the /predict field
+SOIL_FIELDS = {'N': 'Nitrogen', 'P': 'Phosporus', 'K': 'Potassium', 'ph': 'Ph'}
+
+@app.route('/recommend_by_weather', methods=['POST'])
+@login_required
+@rate_limited('weather')
+def recommend_by_weather():
+    data = request.get_json(silent=True) or request.form
+    try:
+        soil = {}
+        for name, field in SOIL_FIELDS.items():
+            if name not in data and field not in data:
+                raise ValueError(f"Missing soil input {name}")
+            soil[name] = float(data[name] if name in data else data[field])
+        top_k = parse_top_k(data.get('top_k'), DEFAULT_TOP_K)
+        city = str(data.get('city', '')).strip()
+        if data.get('latitude') not in (None, '') and data.get('longitude') not in (None, ''):
+            location = (float(data['latitude']), float(data['longitude']))
+        elif city:
+            location = None
+        else:
+            raise ValueError("Provide a city or a latitude and longitude")
+        if not np.isfinite(list(soil.values()) + list(location or ())).all():
+            raise ValueError("Every value must be a finite number")
+        if location and not (-90 <= location[0] <= 90 and -180 <= location[1] <= 180):
+            raise ValueError("latitude must be between -90 and 90 and longitude between -180 and 180")
+    except (ValueError, TypeError) as e:
+        return jsonify(success=False, message=str(e)), 400
+
+    # Warm the model while the upstream calls are in flight
+    warmup = weather_client.executor.submit(get_engine)
+    try:
+        latitude, longitude = location or weather_client.geocode(city)
+        climate = weather_client.climate(latitude, longitude)
+    except WeatherOverloaded as e:
+        return reject('overload', str(e), 503, 1)
+    except WeatherError as e:
+        return jsonify(success=False, message=str(e)), 502
+    warmup.result()
+
+    feature_list = [soil['N'], soil['P'], soil['K'], climate['temperature'], climate['humidity'], soil['ph'], climate['rainfall']]
+    try:
+        labels, proba = rank_matrix(np.array(feature_list).reshape(1, -1), top_k)
+    except ValueError as e:
+        return jsonify(success=False, message=str(e)), 400
+    top = [{'label': label, 'crop': crop_dict.get(label, "Unknown"), 'probability': round(p, 4)}
+           for label, p in zip(labels[0].tolist(), proba[0].tolist())]
+    warnings, explanation = check_inputs(feature_list, top[0]['label'])
+    return jsonify(success=True, city=city, latitude=latitude, longitude=longitude,
+                   climate=climate, crop=top[0]['crop'], top=top, warnings=warnings, explanation=explanation)
+
+def on_model_swap(model):
+    """Drop everything derived from the previous model once a new version is live."""
+    global _similarity_index, crop_envelopes
+    prediction_cache.clear()
+    with _similarity_lock:
+        _similarity_index = None
+    crop_envelopes = load_envelopes(MODEL_BUNDLE_DIR, os.path.join(base_dir, 'Crop_recommendation.csv'))
+
+model_registry.on_swap(on_model_swap)
+
+@app.route('/model')
+def model_info():
+    return jsonify(model_registry.stats())
+
+@app.route('/admin/reload_model', methods=['POST'])
+def reload_model():
+    if not MODEL_ADMIN_TOKEN:
+        return jsonify(success=False, message='Model reload is disabled'), 404
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', '').encode('utf-8'),
+                               MODEL_ADMIN_TOKEN.encode('utf-8')):
+        return jsonify(success=False, message='Invalid admin token'), 403
+    try:
+        with timed('model_reload'):
+            model = model_registry.reload()
+    except Exception as e:
+        logging.exception("Model reload failed")
+        active = model_registry.loaded()
+        status = 422 if isinstance(e, ModelError) else 500
+        return jsonify(success=False, message=str(e), version=active.version if active else None), status
+    g.model_version = model.version
+    return jsonify(success=True, **model.info())
+
+def collect_component_stats():
+    cache = prediction_cache.stats()
+    weather = weather_client.stats()
+    yield ('crop_prediction_cache_size', 'gauge', 'Entries in the prediction cache.', {}, cache['size'])
+    for name in ('hits', 'misses', 'evictions'):
+        yield (f'crop_prediction_cache_{name}_total', 'counter', f'Prediction cache {name}.', {}, cache[name])
+    yield ('crop_weather_upstream_calls_total', 'counter', 'Calls made to Open-Meteo.', {}, weather['upstream_calls'])
+    yield ('crop_weather_coalesced_calls_total', 'counter', 'Weather lookups that joined an in-flight call.', {},
+           weather['coalesced_calls'])
+    yield ('crop_weather_shed_calls_total', 'counter', 'Weather lookups refused because all upstream slots were busy.',
+           {}, weather['shed_calls'])
+    for cache_name in ('geocode_cache', 'forecast_cache'):
+        for name in ('hits', 'misses'):
+            yield (f'crop_weather_cache_{name}_total', 'counter', f'Weather cache {name}.',
+                   {'cache': cache_name}, weather[cache_name][name])
+    yield ('crop_db_connections_opened_total', 'counter', 'SQLite connections opened by this process.', {},
+           db_pool.opened)
+    model = model_registry.loaded()
+    if model is not None:
+        yield ('crop_model_info', 'gauge', 'The model version being served.', {'version': model.version}, 1)
+        yield ('crop_model_loaded_timestamp_seconds', 'gauge', 'When the served model was loaded.', {},
+               model.loaded_at)
+    yield ('crop_model_reloads_total', 'counter', 'Model versions swapped in after startup.', {},
+           model_registry.reloads)
+    yield ('crop_model_reload_failures_total', 'counter', 'Model reloads rejected or failed.', {},
+           model_registry.failures)
+
+registry.add_collector(collect_component_stats)
+
+@app.route('/metrics')
+def metrics():
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/weather_stats')
+def weather_stats():
+    return jsonify(weather_client.stats())
+
+# With gunicorn --preload, load the model and similarity index in the master so workers inherit them
+if os.environ.get('PRELOAD_MODEL') == '1':
+    get_engine()
+    get_similarity_index()
+
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
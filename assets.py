@@ -0,0 +1,163 @@
+"""Fingerprinted static assets.
+
+    python assets.py            # build static/dist/ and its manifest
+    python assets.py --clean    # remove stale files from static/dist/ as well
+
+Every image in static/ is written to static/dist/ with a content hash in its
+name, capped at MAX_WIDTH, plus WebP variants at VARIANT_WIDTHS; videos and
+other files are copied under a hashed name. Templates resolve asset names
+through the manifest, so hashed URLs can be cached forever. Without a built
+manifest the originals are served, found case-insensitively. Resizing and WebP
+need Pillow; without it images are only fingerprinted.
+"""
+import hashlib
+import io
+import json
+import os
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# Widest image the pages display, and the WebP widths offered in srcset
+MAX_WIDTH = 1600
+VARIANT_WIDTHS = (480, 960)
+JPEG_QUALITY = 85
+WEBP_QUALITY = 80
+
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+
+
+class AssetManifest:
+    """Maps logical asset names (any case) to the files under static/ that serve them."""
+
+    def __init__(self, static_dir):
+        self.static_dir = static_dir
+        self.files = {name.lower(): name for name in os.listdir(static_dir)
+                      if os.path.isfile(os.path.join(static_dir, name))}
+        path = os.path.join(static_dir, DIST, MANIFEST)
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f)
+
+    def path(self, name):
+        """Path relative to static/ for ``name``: the hashed build if there is one, else the original."""
+        key = name.lower()
+        entry = self.entries.get(key)
+        if entry is not None:
+            return entry['file']
+        return self.files.get(key, name)
+
+    def webp(self, name):
+        """[(path, width)] of the WebP variants of ``name``, smallest first; empty when not built."""
+        entry = self.entries.get(name.lower(), {})
+        return [(variant['file'], variant['width']) for variant in entry.get('webp', [])]
+
+    def crop_image(self, crop):
+        """The canonical image for a crop name, or default.jpg when there is none."""
+        name = f"{crop.lower()}.jpg"
+        return name if name in self.entries or name in self.files else 'default.jpg'
+
+    @staticmethod
+    def is_fingerprinted(path):
+        """True for URLs of hashed build outputs, which never change content."""
+        return f'/{DIST}/' in path and not path.endswith(MANIFEST)
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:10]
+
+
+def write_hashed(dist_dir, stem, ext, data):
+    name = f"{stem}.{content_hash(data)}{ext}"
+    path = os.path.join(dist_dir, name)
+    if not os.path.exists(path):
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+    return f"{DIST}/{name}"
+
+
+def encode(image, fmt, quality):
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def build_image(Image, source, dist_dir, stem):
+    with Image.open(source) as image:
+        image = image.convert('RGB')
+        resized = image.width > MAX_WIDTH
+        if resized:
+            image = image.resize((MAX_WIDTH, round(image.height * MAX_WIDTH / image.width)), Image.LANCZOS)
+        with open(source, 'rb') as f:
+            original = f.read()
+        # Keep the original bytes when re-encoding doesn't make the file smaller
+        data = encode(image, 'JPEG', JPEG_QUALITY)
+        if len(data) >= len(original) and not resized and source.lower().endswith(('.jpg', '.jpeg')):
+            data = original
+        entry = {'file': write_hashed(dist_dir, stem, '.jpg', data), 'width': image.width, 'height': image.height,
+                 'webp': []}
+        for width in VARIANT_WIDTHS + (image.width,):
+            if width > image.width or any(v['width'] == width for v in entry['webp']):
+                continue
+            variant = image if width == image.width else \
+                image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+            entry['webp'].append({'file': write_hashed(dist_dir, f"{stem}-{width}", '.webp',
+                                                       encode(variant, 'WEBP', WEBP_QUALITY)),
+                                  'width': width})
+    return entry
+
+
+def build(static_dir, clean=False):
+    """Write static/dist/ and its manifest; returns (manifest, bytes before, bytes after)."""
+    try:
+        from PIL import Image
+    except ImportError:
+        Image = None
+        print("Pillow is not installed (pip install pillow): images are fingerprinted but not resized")
+
+    dist_dir = os.path.join(static_dir, DIST)
+    os.makedirs(dist_dir, exist_ok=True)
+    manifest = {}
+    before = after = 0
+    for name in sorted(os.listdir(static_dir)):
+        source = os.path.join(static_dir, name)
+        if not os.path.isfile(source):
+            continue
+        stem, ext = os.path.splitext(name.lower())
+        before += os.path.getsize(source)
+        if Image is not None and ext in IMAGE_EXTENSIONS:
+            entry = build_image(Image, source, dist_dir, stem)
+        else:
+            with open(source, 'rb') as f:
+                entry = {'file': write_hashed(dist_dir, stem, ext, f.read())}
+        manifest[name.lower()] = entry
+        after += os.path.getsize(os.path.join(static_dir, entry['file']))
+
+    path = os.path.join(dist_dir, MANIFEST)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+    if clean:
+        live = {os.path.basename(entry['file']) for entry in manifest.values()}
+        live |= {os.path.basename(v['file']) for entry in manifest.values() for v in entry.get('webp', [])}
+        for name in os.listdir(dist_dir):
+            if name not in live and name != MANIFEST:
+                os.remove(os.path.join(dist_dir, name))
+    return manifest, before, after
+
+
+if __name__ == "__main__":
+    import argparse
+
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--static-dir', default=os.path.join(base_dir, 'static'))
+    parser.add_argument('--clean', action='store_true', help="delete dist files no longer in the manifest")
+    args = parser.parse_args()
+
+    manifest, before, after = build(args.static_dir, args.clean)
+    print(f"wrote {len(manifest)} assets to {os.path.join(args.static_dir, DIST)} "
+          f"({before / 1024:.0f} KB originals -> {after / 1024:.0f} KB full-size builds)")
@@ -0,0 +1,97 @@
+"""Concurrent /login throughput against a throwaway user database.
+
+    python benchmarks/bench_login.py --threads 8 --logins 500
+
+Also times the pre-pool login path (fresh connection + PRAGMA + two queries)
+directly against the same database for comparison.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def legacy_login(path, username, password):
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute('PRAGMA journal_mode=WAL')
+    cursor = conn.cursor()
+    cursor.execute('SELECT * FROM users WHERE username = ?', (username,))
+    user = cursor.fetchone()
+    if user:
+        cursor.execute('SELECT * FROM users WHERE username = ? AND password = ?', (username, password))
+        user = cursor.fetchone()
+    conn.close()
+    return user is not None
+
+
+def run_threads(n_threads, n_calls, call):
+    barrier = threading.Barrier(n_threads + 1)
+    errors = []
+
+    def worker(t):
+        barrier.wait()
+        for i in range(n_calls):
+            try:
+                call(t, i)
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(t,)) for t in range(n_threads)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if errors:
+        raise errors[0]
+    return n_threads * n_calls / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--logins', type=int, default=500, help="logins per thread")
+    parser.add_argument('--users', type=int, default=100)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ['USERS_DB'] = os.path.join(tmp, 'users.db')
+    sys.path.insert(0, ROOT)
+    import app as crop_app
+
+    crop_app.app.logger.disabled = True
+    clients = [crop_app.app.test_client() for _ in range(args.threads)]
+    for u in range(args.users):
+        clients[0].post('/register', data={'username': f'user{u}', 'password': f'pw{u}'})
+
+    def route_login(t, i):
+        u = (t * args.logins + i) % args.users
+        response = clients[t].post('/login', data={'username': f'user{u}', 'password': f'pw{u}'})
+        assert response.get_json()['success']
+
+    def pooled_check(t, i):
+        u = (t * args.logins + i) % args.users
+        with crop_app.db_pool.connection() as conn:
+            row = conn.execute('SELECT id, password FROM users WHERE username = ?', (f'user{u}',)).fetchone()
+        assert row[1] == f'pw{u}'
+
+    def legacy_check(t, i):
+        u = (t * args.logins + i) % args.users
+        assert legacy_login(os.environ['USERS_DB'], f'user{u}', f'pw{u}')
+
+    print(f"{args.threads} threads x {args.logins} logins")
+    print(f"POST /login (pooled):       {run_threads(args.threads, args.logins, route_login):8.0f} logins/s")
+    print(f"credential check, pooled:   {run_threads(args.threads, args.logins, pooled_check):8.0f} checks/s")
+    print(f"credential check, legacy:   {run_threads(args.threads, args.logins, legacy_check):8.0f} checks/s")
+    print(f"connections opened by pool: {crop_app.db_pool.opened}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""Latency and throughput benchmarks for the app's hot routes.
+
+    python benchmarks/run.py --output bench.json
+    python benchmarks/run.py --compare bench.json --threshold 0.2
+
+Every scenario drives the Flask app through its test client, with inputs
+sampled from Crop_recommendation.csv, a throwaway user database and the
+local Open-Meteo stub. Results are written as JSON so runs on different
+commits can be compared; --compare exits non-zero when any scenario's p50
+or p99 latency regressed by more than --threshold.
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FORM_FIELDS = {'N': 'Nitrogen', 'P': 'Phosporus', 'K': 'Potassium', 'temperature': 'Temperature',
+               'humidity': 'Humidity', 'ph': 'Ph', 'rainfall': 'Rainfall'}
+
+
+def load_samples(n, seed):
+    with open(os.path.join(ROOT, 'Crop_recommendation.csv'), newline='') as f:
+        rows = list(csv.DictReader(f))
+    rng = random.Random(seed)
+    return [rng.choice(rows) for _ in range(n)]
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def measure(name, call, iterations, warmup, rows_per_call=1):
+    for i in range(warmup):
+        call(i)
+    timings = []
+    start = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        call(i)
+        timings.append(time.perf_counter() - t0)
+    total = time.perf_counter() - start
+    timings.sort()
+    result = {
+        'iterations': iterations,
+        'rows_per_call': rows_per_call,
+        'mean_ms': round(sum(timings) / len(timings) * 1e3, 4),
+        'p50_ms': round(percentile(timings, 50) * 1e3, 4),
+        'p90_ms': round(percentile(timings, 90) * 1e3, 4),
+        'p99_ms': round(percentile(timings, 99) * 1e3, 4),
+        'max_ms': round(timings[-1] * 1e3, 4),
+        'requests_per_s': round(iterations / total, 2),
+        'rows_per_s': round(iterations * rows_per_call / total, 2),
+    }
+    print(f"{name:<22} p50 {result['p50_ms']:9.3f} ms  p99 {result['p99_ms']:9.3f} ms  "
+          f"{result['requests_per_s']:10.1f} req/s  {result['rows_per_s']:12.1f} rows/s")
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def ok(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.request.path} returned {response.status_code}")
+    return response
+
+
+def run(args):
+    tmp = tempfile.mkdtemp()
+    os.environ['USERS_DB'] = os.path.join(tmp, 'users.db')
+    # One client drives every scenario, far faster than the per-client limits allow
+    for group in ('PREDICT', 'BATCH', 'WEATHER'):
+        os.environ[f'RATE_LIMIT_{group}'] = '0'
+    if args.no_cache:
+        os.environ['PREDICTION_CACHE_SIZE'] = '0'
+    sys.path.insert(0, ROOT)
+
+    import logging
+    from stub_open_meteo import StubOpenMeteo
+
+    stub = StubOpenMeteo(delay=args.upstream_delay).start()
+    os.environ['OPEN_METEO_GEOCODING_URL'] = stub.base_url + '/v1/search'
+    os.environ['OPEN_METEO_FORECAST_URL'] = stub.base_url + '/v1/forecast'
+
+    import app as crop_app
+
+    logging.getLogger().setLevel(logging.WARNING)
+    client = crop_app.app.test_client()
+    ok(client.post('/register', data={'username': 'bench', 'password': 'bench'}))
+    ok(client.post('/login', data={'username': 'bench', 'password': 'bench'}))
+
+    samples = load_samples(max(args.iterations, args.batch_size), args.seed)
+    forms = [{field: row[name] for name, field in FORM_FIELDS.items()} for row in samples]
+    batch = {'rows': [[float(row[name]) for name in FORM_FIELDS] for row in samples[:args.batch_size]]}
+    crops = sorted(crop_app.crop_details)
+    cities = ['Pune', 'Mumbai', 'Delhi', 'Nagpur']
+    n = args.iterations
+
+    results = {}
+    results['predict_single'] = measure(
+        'predict_single', lambda i: ok(client.post('/predict', data=forms[i % len(forms)])), n, args.warmup)
+    results['predict_batch'] = measure(
+        'predict_batch', lambda i: ok(client.post('/predict_batch', json=batch)).get_data(),
+        max(1, n // 10), 1, rows_per_call=args.batch_size)
+    results['crop_info'] = measure(
+        'crop_info', lambda i: ok(client.get(f'/crop_info/{crops[i % len(crops)]}')), n, args.warmup)
+    results['login'] = measure(
+        'login', lambda i: ok(client.post('/login', data={'username': 'bench', 'password': 'bench'})), n, args.warmup)
+    results['weather'] = measure(
+        'weather', lambda i: ok(client.post('/weather', data={'city': cities[i % len(cities)]})), n, args.warmup)
+
+    def weather_cold(i):
+        crop_app.weather_client.geocode_cache.clear()
+        crop_app.weather_client.forecast_cache.clear()
+        ok(client.post('/weather', data={'city': cities[i % len(cities)]}))
+
+    results['weather_cold'] = measure('weather_cold', weather_cold, max(1, n // 10), 1)
+    stub.stop()
+
+    import numpy
+    return {
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': numpy.__version__,
+        'machine': platform.machine(),
+        'config': {'iterations': args.iterations, 'batch_size': args.batch_size, 'seed': args.seed,
+                   'no_cache': args.no_cache, 'upstream_delay': args.upstream_delay},
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold):
+    regressions = []
+    print(f"\nvs {baseline.get('commit')} ({baseline.get('timestamp')})")
+    for name, result in current['results'].items():
+        before = baseline.get('results', {}).get(name)
+        if before is None:
+            continue
+        for metric in ('p50_ms', 'p99_ms'):
+            if not before[metric]:
+                continue
+            change = result[metric] / before[metric] - 1
+            flag = ' REGRESSION' if change > threshold else ''
+            print(f"{name:<22} {metric:<7} {before[metric]:9.3f} -> {result[metric]:9.3f} ms ({change:+.1%}){flag}")
+            if flag:
+                regressions.append((name, metric))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--no-cache', action='store_true', help="disable the prediction cache")
+    parser.add_argument('--upstream-delay', type=float, default=0.0, help="stub Open-Meteo delay in seconds")
+    parser.add_argument('--output', help="write results as JSON to this file")
+    parser.add_argument('--compare', help="baseline JSON from an earlier run")
+    parser.add_argument('--threshold', type=float, default=0.2, help="allowed relative slowdown")
+    args = parser.parse_args()
+
+    current = run(args)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(current, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
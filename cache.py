@@ -0,0 +1,175 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from inference import FEATURES
+
+
+class PredictionCache:
+    """Thread-safe LRU cache of per-row class probabilities keyed on quantized inputs.
+
+    ``precision`` is the number of decimals each feature is rounded to when building
+    the key, either one int for all features or one per feature. A ``maxsize`` of 0
+    disables caching. clear() bumps ``generation``; put_many() given an older
+    generation is dropped, so rows computed by a replaced model never land.
+    """
+
+    def __init__(self, maxsize=4096, precision=2):
+        if np.ndim(precision) != 0 and len(precision) != len(FEATURES):
+            # A short list would key on only some features and mix up different inputs
+            raise ValueError(f"precision needs one entry per feature ({len(FEATURES)}), got {len(precision)}")
+        self.maxsize = maxsize
+        self.precision = precision
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.generation = 0
+
+    def keys_for(self, features):
+        """Quantize an (n, n_features) matrix into one hashable key per row."""
+        if np.ndim(self.precision) == 0:
+            quantized = np.round(features, self.precision)
+        else:
+            quantized = np.column_stack([np.round(features[:, i], p) for i, p in enumerate(self.precision)])
+        # + 0.0 folds -0.0 into 0.0 so both round to the same key
+        return [tuple(row) for row in (quantized + 0.0).tolist()]
+
+    def get_many(self, keys):
+        """Return a list with the cached value or None for every key."""
+        if not self.maxsize:
+            self.misses += len(keys)
+            return [None] * len(keys)
+        found = []
+        with self._lock:
+            for key in keys:
+                value = self._data.get(key)
+                if value is None:
+                    self.misses += 1
+                else:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                found.append(value)
+        return found
+
+    def put_many(self, keys, values, generation=None):
+        if not self.maxsize:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            for key, value in zip(keys, values):
+                self._data[key] = value
+                self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.generation += 1
+
+    def stats(self):
+        with self._lock:
+            size = len(self._data)
+        lookups = self.hits + self.misses
+        return {
+            'size': size,
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def parse_precision(value):
+    """Parse '2' or a comma-separated per-feature list such as '0,0,0,1,1,1,0'."""
+    parts = [int(part) for part in str(value).split(',')]
+    return parts[0] if len(parts) == 1 else parts
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire ``ttl`` seconds after being stored."""
+
+    def __init__(self, maxsize=1024, ttl=300.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > self.clock():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        if not self.maxsize:
+            return
+        with self._lock:
+            self._data[key] = (self.clock() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            size = len(self._data)
+        return {'size': size, 'maxsize': self.maxsize, 'ttl': self.ttl,
+                'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one call of the underlying function."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.shared = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = {'done': threading.Event(), 'value': None, 'error': None}
+                leader = True
+            else:
+                self.shared += 1
+                leader = False
+
+        if not leader:
+            call['done'].wait()
+        else:
+            try:
+                call['value'] = fn()
+            except Exception as e:
+                call['error'] = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call['done'].set()
+
+        if call['error'] is not None:
+            raise call['error']
+        return call['value']
@@ -0,0 +1,74 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+class ConnectionPool:
+    """Per-process pool of SQLite connections.
+
+    PRAGMAs run once when a connection is opened instead of on every checkout, and
+    ``setup`` (e.g. schema creation) runs once per process on the first checkout.
+    Connections inherited across a fork are discarded, never shared with the parent.
+    """
+
+    def __init__(self, path, size=8, timeout=30, setup=None):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self.setup = setup
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue(maxsize=self.size)
+        self._ready = False
+        self.opened = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        self.opened += 1
+        return conn
+
+    def _checkout(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    if self.setup is not None:
+                        self.setup(conn)
+                    self._ready = True
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection, committing on success and rolling back on error."""
+        conn = self._checkout()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
@@ -0,0 +1,114 @@
+import csv
+import logging
+import os
+
+import numpy as np
+
+from inference import FEATURES, crop_dict
+
+# Statistics kept per crop and feature, as quantiles of the training samples
+QUANTILES = (0.0, 0.05, 0.25, 0.5, 0.75, 0.95, 1.0)
+MIN, Q05, Q25, MEDIAN, Q75, Q95, MAX = range(len(QUANTILES))
+
+# File written next to the model bundle arrays
+ENVELOPES_FILE = 'envelopes.npy'
+
+# Per-feature verdicts, from best to worst fit
+STATUSES = ('typical', 'within range', 'unusual', 'outside range')
+
+
+class CropEnvelopes:
+    """Per-crop feature quantiles in one (labels, quantiles, features) array.
+
+    Row ``label`` holds the quantiles of that crop's samples and row 0 those of
+    the whole dataset, so checking an input is a handful of comparisons against
+    two rows of the table; the dataset itself is only read when building it.
+    """
+
+    def __init__(self, table):
+        self.table = table
+
+    @classmethod
+    def from_csv(cls, path):
+        label_of = {name.lower(): label for label, name in crop_dict.items()}
+        with open(path, newline='') as f:
+            rows = [([float(row[name]) for name in FEATURES], label_of[row['label'].lower()])
+                    for row in csv.DictReader(f)]
+        features = np.array([features for features, _ in rows], dtype=np.float64).reshape(-1, len(FEATURES))
+        labels = np.array([label for _, label in rows], dtype=np.int64)
+
+        table = np.full((max(crop_dict) + 1, len(QUANTILES), len(FEATURES)), np.nan)
+        table[0] = np.quantile(features, QUANTILES, axis=0)
+        for label in np.unique(labels):
+            table[label] = np.quantile(features[labels == label], QUANTILES, axis=0)
+        return cls(table)
+
+    def save(self, bundle_dir):
+        os.makedirs(bundle_dir, exist_ok=True)
+        path = os.path.join(bundle_dir, ENVELOPES_FILE)
+        with open(path + '.tmp', 'wb') as f:
+            np.save(f, self.table)
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, bundle_dir):
+        return cls(np.load(os.path.join(bundle_dir, ENVELOPES_FILE)))
+
+    def medians(self):
+        """(X, labels): the per-feature median row of every crop with samples."""
+        labels = np.flatnonzero(~np.isnan(self.table[1:, MEDIAN, 0])) + 1
+        return self.table[labels, MEDIAN], labels
+
+    def status(self, X, labels):
+        """Index into STATUSES for every feature of every row, against the crop in ``labels``.
+
+        Returns an (n, features) int array; NaN rows (crops without samples) count as typical.
+        """
+        X = np.asarray(X, dtype=np.float64).reshape(-1, len(FEATURES))
+        stats = self.table[np.asarray(labels, dtype=np.intp)]
+        status = np.zeros(X.shape, dtype=np.int8)
+        status[(X < stats[:, Q25]) | (X > stats[:, Q75])] = 1
+        status[(X < stats[:, Q05]) | (X > stats[:, Q95])] = 2
+        status[(X < stats[:, MIN]) | (X > stats[:, MAX])] = 3
+        return status
+
+    def out_of_range(self, X):
+        """Boolean (n, features) mask of values outside everything seen in the dataset."""
+        return self.status(X, np.zeros(len(np.atleast_2d(X)), dtype=np.intp)) == 3
+
+    def warnings(self, x):
+        """Messages for the features of one row that lie outside the dataset's range."""
+        overall = self.table[0]
+        return [f"{name} {value:g} is outside the range seen in the training data "
+                f"({overall[MIN, i]:g} to {overall[MAX, i]:g})"
+                for i, (name, value, flagged) in enumerate(zip(FEATURES, x, self.out_of_range(x)[0])) if flagged]
+
+    def explain(self, x, label):
+        """How each feature of one row compares with the typical values for crop ``label``."""
+        stats = self.table[label]
+        status = self.status(x, [label])[0]
+        return [{'feature': name, 'value': float(value), 'status': STATUSES[s],
+                 'typical_low': round(float(stats[Q25, i]), 2), 'typical_high': round(float(stats[Q75, i]), 2),
+                 'min': round(float(stats[MIN, i]), 2), 'max': round(float(stats[MAX, i]), 2)}
+                for i, (name, value, s) in enumerate(zip(FEATURES, x, status.tolist()))]
+
+
+def load_envelopes(bundle_dir, data_path):
+    """Load the precomputed table, or compute it from the dataset when the bundle lacks one."""
+    if os.path.exists(os.path.join(bundle_dir, ENVELOPES_FILE)):
+        return CropEnvelopes.load(bundle_dir)
+    logging.warning("No %s in %s, computing crop envelopes from %s", ENVELOPES_FILE, bundle_dir, data_path)
+    return CropEnvelopes.from_csv(data_path)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Precompute per-crop feature envelopes into the model bundle.")
+    parser.add_argument('--data', default=os.path.join(base_dir, 'Crop_recommendation.csv'))
+    parser.add_argument('--bundle-dir', default=os.path.join(base_dir, 'model_bundle'))
+    args = parser.parse_args()
+
+    CropEnvelopes.from_csv(args.data).save(args.bundle_dir)
+    print(f"wrote {os.path.join(args.bundle_dir, ENVELOPES_FILE)}")
@@ -0,0 +1,320 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import time
+
+import numpy as np
+
+PICKLES = ('model.pkl', 'minmaxscaler.pkl', 'standscaler.pkl')
+
+# Column order of Crop_recommendation.csv, which is what the scalers were fit on
+FEATURES = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
+
+crop_dict = {1: "Rice", 2: "Maize", 3: "Jute", 4: "Cotton", 5: "Coconut", 6: "Papaya", 7: "Orange",
+             8: "Apple", 9: "Muskmelon", 10: "Watermelon", 11: "Grapes", 12: "Mango", 13: "Banana",
+             14: "Pomegranate", 15: "Lentil", 16: "Blackgram", 17: "Mungbean", 18: "Mothbeans",
+             19: "Pigeonpeas", 20: "Kidneybeans", 21: "Chickpea", 22: "Coffee"}
+
+# Arrays written to / read from a model bundle directory, one .npy file each
+ARRAYS = ('scale', 'offset', 'feature', 'threshold', 'children', 'is_leaf', 'value', 'roots', 'classes')
+
+# Rows per block when gathering leaf votes, bounding the (rows, trees, classes) temporary
+PROBA_CHUNK = 1024
+
+
+class ForestEngine:
+    """Fused MinMax -> Standard -> RandomForest inference over flat NumPy node arrays.
+
+    Both scalers are affine, so they are folded into a single ``x * scale + offset``
+    step. All trees of the forest are concatenated into one set of contiguous node
+    arrays and every (sample, tree) pair is stepped down its tree together, dropping
+    pairs from the active set as soon as they reach a leaf.
+    """
+
+    def __init__(self, scale, offset, feature, threshold, children, is_leaf, value, roots, classes):
+        self.scale = scale
+        self.offset = offset
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.is_leaf = is_leaf
+        self.value = value
+        self.roots = roots
+        self.classes = classes
+        self.n_features = len(scale)
+
+    @classmethod
+    def from_sklearn(cls, model, ms, sc):
+        # ms: x * scale_ + min_, sc: (x - mean_) / scale_
+        sc_mean = sc.mean_ if sc.with_mean else np.zeros_like(ms.scale_)
+        sc_scale = sc.scale_ if sc.with_std else np.ones_like(ms.scale_)
+        scale = ms.scale_ / sc_scale
+        offset = (ms.min_ - sc_mean) / sc_scale
+
+        features, thresholds, children, leaves, values, roots = [], [], [], [], [], []
+        start = 0
+        n_classes = len(model.classes_)
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            ids = np.arange(tree.node_count) + start
+            is_leaf = tree.children_left == -1
+
+            # Leaves point back at themselves so a stray extra step is harmless
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            children.append(np.stack([np.where(is_leaf, ids, tree.children_left + start),
+                                      np.where(is_leaf, ids, tree.children_right + start)], axis=1))
+            leaves.append(is_leaf)
+
+            # Same normalisation DecisionTreeClassifier.predict_proba applies per leaf
+            value = tree.value[:, 0, :n_classes].astype(np.float64)
+            normalizer = value.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(value / normalizer)
+
+            roots.append(start)
+            start += tree.node_count
+
+        # sklearn compares float32 inputs against float64 thresholds; for a float32 x,
+        # x <= t holds exactly when x <= the largest float32 not above t.
+        threshold = np.concatenate(thresholds)
+        threshold32 = threshold.astype(np.float32)
+        above = threshold32.astype(np.float64) > threshold
+        threshold32[above] = np.nextafter(threshold32[above], np.float32(-np.inf))
+
+        return cls(
+            scale=np.ascontiguousarray(scale, dtype=np.float64),
+            offset=np.ascontiguousarray(offset, dtype=np.float64),
+            feature=np.concatenate(features).astype(np.int32),
+            threshold=threshold32,
+            children=np.concatenate(children).ravel().astype(np.int32),
+            is_leaf=np.concatenate(leaves),
+            value=np.ascontiguousarray(np.concatenate(values)),
+            roots=np.asarray(roots, dtype=np.int32),
+            classes=np.asarray(model.classes_),
+        )
+
+    @classmethod
+    def from_pickles(cls, base_dir):
+        with open(os.path.join(base_dir, 'model.pkl'), 'rb') as f:
+            model = pickle.load(f)
+        with open(os.path.join(base_dir, 'standscaler.pkl'), 'rb') as f:
+            sc = pickle.load(f)
+        with open(os.path.join(base_dir, 'minmaxscaler.pkl'), 'rb') as f:
+            ms = pickle.load(f)
+        return cls.from_sklearn(model, ms, sc)
+
+    def save(self, bundle_dir, sources=None):
+        """Write the node arrays as plain .npy files that load() can memory-map."""
+        os.makedirs(bundle_dir, exist_ok=True)
+        # Each file is replaced by rename, never rewritten in place: a running process
+        # that has the old arrays memory-mapped keeps reading the old, intact inodes
+        for name in ARRAYS:
+            path = os.path.join(bundle_dir, f'{name}.npy')
+            with open(path + '.tmp', 'wb') as f:
+                np.save(f, getattr(self, name), allow_pickle=False)
+            os.replace(path + '.tmp', path)
+        path = os.path.join(bundle_dir, 'meta.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'sources': sources or {}}, f, indent=2, sort_keys=True)
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, bundle_dir, mmap_mode='r'):
+        """Load a bundle written by save().
+
+        With the default read-only ``mmap_mode`` the node arrays are backed by the page
+        cache, so every worker process on the host shares a single copy of the forest.
+        """
+        arrays = {}
+        for name in ARRAYS:
+            array = np.load(os.path.join(bundle_dir, f'{name}.npy'), mmap_mode=mmap_mode, allow_pickle=False)
+            # A plain ndarray view over the mapping avoids np.memmap's per-operation overhead
+            arrays[name] = array.view(np.ndarray)
+        return cls(**arrays)
+
+    def transform(self, X):
+        """Apply the folded scalers and cast to float32, as sklearn trees do.
+
+        Raises ValueError for NaN, infinite or float32-overflowing inputs, which the
+        pickled chain either rejects or routes by rules the flat arrays don't keep.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected an (n, {self.n_features}) feature matrix, got shape {X.shape}")
+        Xt = np.empty(X.shape, dtype=np.float32)
+        with np.errstate(over='ignore', invalid='ignore'):
+            np.add(X * self.scale, self.offset, out=Xt, casting='same_kind')
+        if not np.isfinite(Xt).all():
+            raise ValueError("Input contains NaN, infinity or a value too large for float32")
+        return Xt
+
+    def scalable(self, X):
+        """Boolean mask of the rows of X that transform() accepts."""
+        X = np.asarray(X, dtype=np.float64).reshape(-1, self.n_features)
+        with np.errstate(over='ignore', invalid='ignore'):
+            Xt = (X * self.scale + self.offset).astype(np.float32)
+        return np.isfinite(Xt).all(axis=1)
+
+    def leaves(self, X):
+        """Return the (n, n_trees) array of leaf node ids reached by each sample."""
+        return self.leaves_scaled(self.transform(X))
+
+    def leaves_scaled(self, Xt):
+        """leaves() for rows already passed through transform()."""
+        flat = Xt.ravel()
+        n = len(flat) // self.n_features
+        n_trees = len(self.roots)
+
+        # Active (tree, sample) pairs, laid out tree-major so lookups stay within one tree.
+        # Every level allocates arrays the size of the pairs still active; reusing
+        # preallocated buffers through out= measured no faster and slower for one row
+        out = np.empty(n_trees * n, dtype=np.int32)
+        pos = np.arange(n_trees * n, dtype=np.int32)
+        node = np.repeat(self.roots, n)
+        row = np.tile(np.arange(n, dtype=np.int32) * self.n_features, n_trees)
+
+        while len(node):
+            index = self.feature.take(node)
+            index += row
+            go_right = flat.take(index) > self.threshold.take(node)
+            node *= 2
+            node += go_right
+            node = self.children.take(node)
+            done = self.is_leaf.take(node)
+            if done.any():
+                out[pos[done]] = node[done]
+                active = ~done
+                node, pos, row = node[active], pos[active], row[active]
+        return out.reshape(n_trees, n).T
+
+    def predict_proba(self, X):
+        return self.predict_proba_scaled(self.transform(X))
+
+    def predict_proba_scaled(self, Xt):
+        """predict_proba() for rows already passed through transform()."""
+        node = self.leaves_scaled(Xt)
+        n_trees = node.shape[1]
+        proba = np.empty((len(node), self.value.shape[1]), dtype=np.float64)
+        # Reducing over the tree axis adds trees in order, matching RandomForestClassifier's sums
+        for start in range(0, len(node), PROBA_CHUNK):
+            stop = start + PROBA_CHUNK
+            np.add.reduce(self.value[node[start:stop]], axis=1, out=proba[start:stop])
+        proba /= n_trees
+        return proba
+
+    def predict(self, X):
+        return self.classes.take(np.argmax(self.predict_proba(X), axis=1))
+
+    def top_k(self, X, k):
+        """Return the k most voted classes per row and their vote fractions, best first."""
+        return self.rank(self.predict_proba(X), k)
+
+    def rank(self, proba, k):
+        """Rank precomputed predict_proba rows, keeping the k best classes per row."""
+        k = max(1, min(k, proba.shape[1]))
+        # Stable sort keeps argmax's first-wins tie breaking, so column 0 equals predict()
+        order = np.argsort(-proba, axis=1, kind='stable')[:, :k]
+        return self.classes.take(order), np.take_along_axis(proba, order, axis=1)
+
+
+def source_digests(base_dir):
+    """sha256 of each source pickle, recorded in a bundle to detect stale bundles."""
+    digests = {}
+    for name in PICKLES:
+        with open(os.path.join(base_dir, name), 'rb') as f:
+            digests[name] = hashlib.sha256(f.read()).hexdigest()
+    return digests
+
+
+def build_bundle(base_dir, bundle_dir):
+    engine = ForestEngine.from_pickles(base_dir)
+    engine.save(bundle_dir, sources=source_digests(base_dir))
+    return engine
+
+
+def load_engine(base_dir, bundle_dir):
+    """Load the memory-mapped bundle if it matches the pickles, else build from the pickles."""
+    meta_path = os.path.join(bundle_dir, 'meta.json')
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            sources = json.load(f).get('sources', {})
+        if sources == source_digests(base_dir):
+            return ForestEngine.load(bundle_dir)
+        logging.warning("Model bundle %s is stale, loading from the pickles", bundle_dir)
+    return ForestEngine.from_pickles(base_dir)
+
+
+def check_equivalence(base_dir, n_random=20000, seed=0):
+    """Compare the engine against the pickled sklearn chain on the dataset plus random inputs."""
+    import pandas as pd
+
+    with open(os.path.join(base_dir, 'model.pkl'), 'rb') as f:
+        model = pickle.load(f)
+    with open(os.path.join(base_dir, 'standscaler.pkl'), 'rb') as f:
+        sc = pickle.load(f)
+    with open(os.path.join(base_dir, 'minmaxscaler.pkl'), 'rb') as f:
+        ms = pickle.load(f)
+    engine = ForestEngine.from_sklearn(model, ms, sc)
+
+    data = pd.read_csv(os.path.join(base_dir, 'Crop_recommendation.csv'))
+    X = data.drop(columns=['label']).to_numpy(dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    low, high = X.min(axis=0), X.max(axis=0)
+    span = high - low
+    X = np.vstack([X, rng.uniform(low - 0.1 * span, high + 0.1 * span, size=(n_random, X.shape[1]))])
+
+    final = sc.transform(ms.transform(X))
+    expected_proba = model.predict_proba(final)
+    expected = model.predict(final)
+    proba = engine.predict_proba(X)
+    predicted = engine.predict(X)
+
+    # Raised explicitly so the check still runs under python -O
+    if not np.array_equal(predicted, expected):
+        raise AssertionError(f"{np.sum(predicted != expected)} predictions differ")
+    if not np.array_equal(proba, expected_proba):
+        raise AssertionError("class probabilities differ")
+
+    # Non-finite rows are refused outright instead of routed down the trees
+    for bad in (np.nan, np.inf, -np.inf, 1e300):
+        row = X[:1].copy()
+        row[0, -1] = bad
+        try:
+            engine.predict(row)
+        except ValueError:
+            continue
+        raise AssertionError(f"engine accepted a row containing {bad}")
+
+    single = X[:1]
+    start = time.perf_counter()
+    for _ in range(200):
+        model.predict(sc.transform(ms.transform(single)))
+    sklearn_latency = (time.perf_counter() - start) / 200
+    start = time.perf_counter()
+    for _ in range(200):
+        engine.predict(single)
+    engine_latency = (time.perf_counter() - start) / 200
+    return len(X), sklearn_latency, engine_latency
+
+
+if __name__ == "__main__":
+    import argparse
+    import warnings
+
+    warnings.filterwarnings('ignore')
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Build or verify the flattened model bundle.")
+    parser.add_argument('command', nargs='?', choices=['check', 'build'], default='check')
+    parser.add_argument('--bundle-dir', default=os.path.join(base_dir, 'model_bundle'))
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build_bundle(base_dir, args.bundle_dir)
+        print(f"wrote {args.bundle_dir}")
+    else:
+        n, sklearn_latency, engine_latency = check_equivalence(base_dir)
+        print(f"{n} rows match the pickled pipeline")
+        print(f"single-row latency: sklearn {sklearn_latency * 1e3:.3f} ms, engine {engine_latency * 1e3:.3f} ms")
@@ -0,0 +1,105 @@
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+def parse_limit(value):
+    """Parse 'rate,burst' (requests per second, bucket size) into a tuple; '0' or '' disables."""
+    parts = [float(part) for part in str(value).split(',') if part.strip()]
+    if not parts or parts[0] <= 0:
+        return None
+    rate = parts[0]
+    burst = parts[1] if len(parts) > 1 else max(1.0, rate)
+    return rate, burst
+
+
+class MemoryBackend:
+    """Token buckets in this process, for one worker or for tests.
+
+    At most ``maxsize`` clients are tracked; the least recently seen is dropped
+    first, which at worst hands that client a full bucket again.
+    """
+
+    def __init__(self, maxsize=100_000, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, cost=1):
+        """Spend ``cost`` tokens; returns 0 if allowed, else the seconds until it would be."""
+        now = self.clock()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens >= cost:
+                tokens -= cost
+                wait = 0.0
+            else:
+                wait = (cost - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+# Same refill-and-spend as MemoryBackend, run atomically by Redis against its own clock
+_REDIS_TAKE = """
+local rate, burst, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+
+class RedisBackend:
+    """Token buckets shared by every worker and host through Redis; needs the redis package."""
+
+    def __init__(self, url, prefix='crop:ratelimit:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_REDIS_URL needs the redis package: pip install redis")
+        self.client = redis.Redis.from_url(url, socket_timeout=0.1, socket_connect_timeout=0.1)
+        self.prefix = prefix
+        self._take = self.client.register_script(_REDIS_TAKE)
+
+    def take(self, key, rate, burst, cost=1):
+        return float(self._take(keys=[self.prefix + key], args=[rate, burst, cost]))
+
+
+class RateLimiter:
+    """Token-bucket limits per client key over a pluggable backend.
+
+    Any object with ``take(key, rate, burst, cost)`` works as the backend. If the
+    backend fails (e.g. Redis is down) requests are let through rather than
+    rejected, and the failure is logged.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None else MemoryBackend()
+
+    def check(self, key, limit, cost=1):
+        """Return 0 when ``key`` may proceed under ``limit`` (rate, burst), else whole seconds to wait."""
+        rate, burst = limit
+        try:
+            wait = self.backend.take(key, rate, burst, cost)
+        except Exception as e:
+            logging.warning("Rate limit backend failed, allowing the request: %s", e)
+            return 0
+        return math.ceil(wait) if wait > 0 else 0
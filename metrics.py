@@ -0,0 +1,118 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context
+
+# Upper bounds in seconds, from 50 µs stages up to slow upstream calls
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is a bisect and three additions under a lock."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class Registry:
+    """Labelled histograms and counters rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._help = {}
+        self._collectors = []
+
+    def histogram(self, name, help_text, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram())
+                self._help.setdefault(name, ('histogram', help_text))
+        return histogram
+
+    def inc(self, name, help_text, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+            self._help.setdefault(name, ('counter', help_text))
+
+    def add_collector(self, collect):
+        """Register a callable returning (name, type, help, labels, value) tuples at scrape time."""
+        self._collectors.append(collect)
+
+    def render(self):
+        samples = {}
+        with self._lock:
+            histograms = list(self._histograms.items())
+            counters = list(self._counters.items())
+            described = dict(self._help)
+
+        for (name, labels), histogram in histograms:
+            counts, total, count = histogram.snapshot()
+            cumulative = 0
+            for bound, n in zip(histogram.buckets + (float('inf'),), counts):
+                cumulative += n
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                samples.setdefault(name, []).append((name + '_bucket', labels + (('le', le),), cumulative))
+            samples[name].append((name + '_sum', labels, total))
+            samples[name].append((name + '_count', labels, count))
+
+        for (name, labels), value in counters:
+            samples.setdefault(name, []).append((name, labels, value))
+
+        for collect in self._collectors:
+            for name, kind, help_text, labels, value in collect():
+                described.setdefault(name, (kind, help_text))
+                samples.setdefault(name, []).append((name, tuple(sorted(labels.items())), value))
+
+        lines = []
+        for name in sorted(samples):
+            kind, help_text = described[name]
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for sample, labels, value in samples[name]:
+                label_text = ','.join(f'{k}="{v}"' for k, v in labels)
+                lines.append(f'{sample}{{{label_text}}} {value}' if label_text else f'{sample} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def record(stage, seconds):
+    """Add a stage timing to its histogram and, when profiling this request, to its trace."""
+    registry.histogram('crop_stage_seconds', 'Time spent in each hot-path stage.', stage=stage).observe(seconds)
+    if has_request_context():
+        profile = g.get('profile')
+        if profile is not None:
+            profile.append((stage, seconds))
+
+
+@contextmanager
+def timed(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
@@ -0,0 +1,164 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+from inference import FEATURES, PICKLES, crop_dict, load_engine, source_digests
+
+# Share of probe rows the new model must label as expected before it is swapped in
+MIN_PROBE_ACCURACY = 0.9
+
+
+class ModelError(Exception):
+    pass
+
+
+class ModelVersion:
+    """One loaded engine with the version id derived from its source pickles."""
+
+    def __init__(self, engine, version, loaded_at):
+        self.engine = engine
+        self.version = version
+        self.loaded_at = loaded_at
+
+    def info(self):
+        return {'version': self.version, 'loaded_at': round(self.loaded_at, 3),
+                'trees': int(len(self.engine.roots)), 'nodes': int(len(self.engine.feature))}
+
+
+class ModelRegistry:
+    """The serving model, replaceable while requests keep running.
+
+    reload() loads the current pickles / bundle, validates the result and then
+    swaps it in with a single reference assignment: a request that already holds
+    the old version finishes with it, new requests get the new one. With an
+    ``interval`` a daemon thread polls the artifact files and reloads once they
+    have stopped changing for one interval, so half-written files are skipped.
+    Callbacks registered with on_swap() run after every swap.
+    """
+
+    def __init__(self, base_dir, bundle_dir, probe=None, interval=0.0):
+        self.base_dir = base_dir
+        self.bundle_dir = bundle_dir
+        self.probe = probe
+        self.interval = interval
+        self._current = None
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._callbacks = []
+        self._watch_pid = None
+        self._signature = None
+        self.reloads = 0
+        self.failures = 0
+        self.last_error = None
+
+    def current(self):
+        """The active ModelVersion, loading the first one on first use."""
+        if self._current is None:
+            with self._lock:
+                if self._current is None:
+                    self._signature = self.signature()
+                    self._current = self._load()
+        if self.interval and self._watch_pid != os.getpid():
+            self._start_watching()
+        return self._current
+
+    def loaded(self):
+        """The active ModelVersion, or None before the first load; never loads."""
+        return self._current
+
+    def on_swap(self, callback):
+        self._callbacks.append(callback)
+
+    def signature(self):
+        """(mtime, size) of every artifact; a change means the files were replaced."""
+        paths = [os.path.join(self.base_dir, name) for name in PICKLES]
+        paths.append(os.path.join(self.bundle_dir, 'meta.json'))
+        signature = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _load(self):
+        digests = source_digests(self.base_dir)
+        version = hashlib.sha256(''.join(digests[name] for name in PICKLES).encode()).hexdigest()[:12]
+        model = ModelVersion(load_engine(self.base_dir, self.bundle_dir), version, time.time())
+        self.validate(model.engine)
+        return model
+
+    def validate(self, engine):
+        """Raise ModelError unless ``engine`` can serve this app's inputs and labels."""
+        if engine.n_features != len(FEATURES):
+            raise ModelError(f"Model expects {engine.n_features} features, not {len(FEATURES)}")
+        unknown = sorted(set(engine.classes.tolist()) - set(crop_dict))
+        if unknown:
+            raise ModelError(f"Model predicts unknown labels {unknown}")
+        if self.probe is not None:
+            X, y = self.probe
+            proba = engine.predict_proba(X)
+            if not np.all(np.isfinite(proba)) or not np.allclose(proba.sum(axis=1), 1.0):
+                raise ModelError("Model returned invalid probabilities")
+            accuracy = float(np.mean(engine.classes.take(np.argmax(proba, axis=1)) == y))
+            if accuracy < MIN_PROBE_ACCURACY:
+                raise ModelError(f"Model labels only {accuracy:.0%} of the probe rows correctly")
+
+    def reload(self):
+        """Load, validate and swap in the artifacts on disk; returns the active version.
+
+        Raises ModelError (or the loading error) and keeps the old version when
+        the new one cannot be loaded or fails validation. Files that hold the
+        version already being served change nothing: no swap, count or callbacks.
+        """
+        with self._reload_lock:
+            signature = self.signature()
+            try:
+                model = self._load()
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                # Remember the files so the watcher waits for the next change before retrying
+                self._signature = signature
+                raise
+            previous = self._current
+            self._signature = signature
+            self.last_error = None
+            if previous is not None and previous.version == model.version:
+                return previous
+            self._current = model
+            self.reloads += 1
+        logging.info("Serving model version %s", model.version)
+        for callback in self._callbacks:
+            callback(model)
+        return model
+
+    def _start_watching(self):
+        with self._lock:
+            if self._watch_pid == os.getpid():
+                return
+            # Threads don't survive a fork, so every worker process starts its own watcher
+            self._watch_pid = os.getpid()
+        threading.Thread(target=self._watch, name='model-watcher', daemon=True).start()
+
+    def _watch(self):
+        seen = self.signature()
+        while True:
+            time.sleep(self.interval)
+            signature = self.signature()
+            if signature != self._signature and signature == seen:
+                try:
+                    self.reload()
+                except Exception:
+                    logging.exception("Model reload failed, still serving %s", self._current.version)
+            seen = signature
+
+    def stats(self):
+        stats = self.current().info()
+        stats.update(reloads=self.reloads, failures=self.failures, last_error=self.last_error)
+        return stats
@@ -0,0 +1,176 @@
+"""Score large soil survey files with the crop model in fixed-size chunks.
+
+    python score_cli.py survey.csv scored.csv --chunk-size 100000 --workers 4
+    python score_cli.py survey.parquet scored.parquet --top-k 3
+
+The input needs the Crop_recommendation.csv feature columns (N, P, K,
+temperature, humidity, ph, rainfall); any other columns are copied through and
+predicted_label / predicted_crop (plus crop_i / probability_i for --top-k > 1)
+and a status column are appended. Rows with a blank, NaN or out-of-range
+feature get status 'invalid' and empty predictions instead of stopping the run.
+At most --workers * 2 chunks are held in memory at once, so memory use depends
+on the chunk size, not the file size. Parquet input and output need pyarrow.
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from inference import FEATURES, crop_dict, load_engine
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+
+_engine = None
+
+
+def _init_worker(bundle_dir):
+    # The bundle is memory-mapped, so every worker shares one copy of the forest
+    global _engine
+    _engine = load_engine(base_dir, bundle_dir)
+
+
+def _score(features, top_k):
+    """(valid mask, labels, proba), ranking only the rows the engine can scale."""
+    valid = _engine.scalable(features)
+    labels, proba = _engine.top_k(features if valid.all() else features[valid], top_k)
+    return valid, labels, proba
+
+
+def is_parquet(path):
+    return path.lower().endswith(('.parquet', '.pq'))
+
+
+def read_chunks(path, chunk_size):
+    if is_parquet(path):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            sys.exit("Reading Parquet needs pyarrow: pip install pyarrow")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+class ChunkWriter:
+    """Append scored chunks to a CSV or Parquet file as they complete."""
+
+    def __init__(self, path):
+        self.path = path
+        self._parquet = None
+        self._csv = None
+
+    def write(self, frame):
+        if is_parquet(self.path):
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                sys.exit("Writing Parquet needs pyarrow: pip install pyarrow")
+            # Features are written as float64 in every chunk, so a blank cell can't change the file's schema
+            frame = frame.assign(**{name: pd.to_numeric(frame[name], errors='coerce').astype(np.float64)
+                                    for name in FEATURES})
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.path, table.schema)
+            self._parquet.write_table(table)
+        else:
+            first = self._csv is None
+            if first:
+                self._csv = open(self.path, 'w', newline='')
+            frame.to_csv(self._csv, header=first, index=False)
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+        if self._csv is not None:
+            self._csv.close()
+
+
+def features_of(frame):
+    missing = [name for name in FEATURES if name not in frame.columns]
+    if missing:
+        sys.exit(f"Input is missing feature columns: {', '.join(missing)}")
+    # Cells that aren't numbers become NaN, so their rows are marked invalid rather than failing the chunk
+    return frame[FEATURES].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+
+
+def with_predictions(frame, valid, labels, proba):
+    frame = frame.copy()
+    names = np.array([crop_dict.get(label, "Unknown") for label in range(max(crop_dict) + 1)], dtype=object)
+
+    def column(values, dtype):
+        # Nullable dtypes keep every chunk's schema the same, whichever rows are missing
+        full = pd.Series(pd.NA, index=frame.index, dtype=dtype)
+        full[valid] = values
+        return full
+
+    frame['predicted_label'] = column(labels[:, 0], 'Int64')
+    frame['predicted_crop'] = column(names[labels[:, 0]], 'string')
+    if labels.shape[1] > 1:
+        for rank in range(labels.shape[1]):
+            frame[f'crop_{rank + 1}'] = column(names[labels[:, rank]], 'string')
+            frame[f'probability_{rank + 1}'] = column(proba[:, rank].round(4), 'Float64')
+    frame['status'] = np.where(valid, 'ok', 'invalid')
+    return frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('input', help="CSV or Parquet file")
+    parser.add_argument('output', help="CSV or Parquet file to write")
+    parser.add_argument('--chunk-size', type=int, default=100_000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="scoring processes; 1 scores in this process")
+    parser.add_argument('--top-k', type=int, default=1)
+    parser.add_argument('--bundle-dir', default=os.path.join(base_dir, 'model_bundle'))
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    writer = ChunkWriter(args.output)
+    rows = 0
+    invalid = []
+
+    def emit(frame, result):
+        nonlocal rows
+        valid = result[0]
+        invalid.extend((rows + np.flatnonzero(~valid)).tolist())
+        writer.write(with_predictions(frame, *result))
+        rows += len(frame)
+
+    try:
+        if args.workers <= 1:
+            _init_worker(args.bundle_dir)
+            for frame in read_chunks(args.input, args.chunk_size):
+                emit(frame, _score(features_of(frame), args.top_k))
+        else:
+            with ProcessPoolExecutor(args.workers, initializer=_init_worker, initargs=(args.bundle_dir,)) as pool:
+                pending = deque()
+                for frame in read_chunks(args.input, args.chunk_size):
+                    pending.append((frame, pool.submit(_score, features_of(frame), args.top_k)))
+                    # Write in input order and keep a bounded number of chunks in flight
+                    while len(pending) >= args.workers * 2:
+                        done, future = pending.popleft()
+                        emit(done, future.result())
+                while pending:
+                    done, future = pending.popleft()
+                    emit(done, future.result())
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"scored {rows - len(invalid)} of {rows} rows in {elapsed:.1f} s ({rows / elapsed:,.0f} rows/s) "
+          f"-> {args.output}")
+    if invalid:
+        shown = ', '.join(map(str, invalid[:10])) + (', ...' if len(invalid) > 10 else '')
+        print(f"{len(invalid)} rows have blank, non-numeric or out-of-range features and were left unscored "
+              f"(status=invalid); data rows {shown}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import csv
+
+import numpy as np
+
+from inference import FEATURES, crop_dict
+
+
+class SimilarityIndex:
+    """KD-tree over historical samples in the model's scaled feature space.
+
+    Rows are scaled with the engine's folded MinMax/Standard transform, so distances
+    match what the forest sees. Queries are batched: one call answers every row.
+    """
+
+    def __init__(self, features, labels, engine, leafsize=16):
+        # scipy.spatial takes ~0.45 s to import; only pay it when an index is built
+        from scipy.spatial import cKDTree
+
+        self.features = np.asarray(features, dtype=np.float64)
+        self.labels = np.asarray(labels)
+        self.engine = engine
+        self.tree = cKDTree(engine.transform(self.features).astype(np.float64), leafsize=leafsize,
+                            balanced_tree=False, compact_nodes=False)
+
+    @classmethod
+    def from_csv(cls, path, engine):
+        """Build from a CSV with the FEATURES columns and a label column of crop names."""
+        label_of = {name.lower(): label for label, name in crop_dict.items()}
+        with open(path, newline='') as f:
+            reader = csv.DictReader(f)
+            rows = [([float(row[name]) for name in FEATURES], label_of[row['label'].lower()]) for row in reader]
+        features = np.array([features for features, _ in rows], dtype=np.float64).reshape(-1, len(FEATURES))
+        return cls(features, np.array([label for _, label in rows], dtype=np.int64), engine)
+
+    def query(self, X, k=5):
+        """Return (distances, indices), each (n, k), for the k nearest samples of every row."""
+        k = max(1, min(k, len(self.labels)))
+        distances, indices = self.tree.query(self.engine.transform(X).astype(np.float64), k=k, workers=-1)
+        return distances.reshape(len(X), k), indices.reshape(len(X), k)
+
+    def neighbours(self, X, k=5):
+        """Nearest samples per row as dicts with the sample's index, label, crop, distance and features."""
+        distances, indices = self.query(X, k)
+        results = []
+        for row_distances, row_indices in zip(distances.tolist(), indices.tolist()):
+            results.append([
+                {'index': i, 'label': int(self.labels[i]), 'crop': crop_dict.get(int(self.labels[i]), "Unknown"),
+                 'distance': round(d, 6),
+                 'features': dict(zip(FEATURES, self.features[i].tolist()))}
+                for d, i in zip(row_distances, row_indices)
+            ])
+        return results
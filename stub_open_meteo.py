@@ -0,0 +1,119 @@
+"""Local stand-in for the Open-Meteo geocoding and forecast APIs.
+
+Run it and point the app at it to exercise /weather without network access:
+
+    python stub_open_meteo.py --port 8765 --delay 0.2
+    OPEN_METEO_GEOCODING_URL=http://127.0.0.1:8765/v1/search \
+    OPEN_METEO_FORECAST_URL=http://127.0.0.1:8765/v1/forecast python app.py
+"""
+import json
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+CITIES = {
+    'pune': (18.52, 73.86),
+    'mumbai': (19.07, 72.88),
+    'delhi': (28.65, 77.23),
+    'nagpur': (21.15, 79.09),
+}
+
+
+class StubOpenMeteo(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), delay=0.0, days=14):
+        super().__init__(address, StubHandler)
+        self.delay = delay
+        self.days = days
+        self.counts = {'geocode': 0, 'forecast': 0}
+        self.counts_lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if url.path == '/v1/search':
+            self._count('geocode')
+            self._send(200, self._geocode(query.get('name', '')))
+        elif url.path == '/v1/forecast':
+            self._count('forecast')
+            try:
+                self._send(200, self._forecast(float(query['latitude']), float(query['longitude']), query))
+            except (KeyError, ValueError):
+                self._send(400, {'error': True, 'reason': 'Invalid latitude or longitude'})
+        else:
+            self._send(404, {'error': True, 'reason': 'Not found'})
+
+    def _count(self, name):
+        with self.server.counts_lock:
+            self.server.counts[name] += 1
+        if self.server.delay:
+            time.sleep(self.server.delay)
+
+    def _geocode(self, name):
+        coords = CITIES.get(name.strip().lower())
+        if coords is None:
+            return {'generationtime_ms': 0.1}
+        return {'results': [{'name': name.title(), 'latitude': coords[0], 'longitude': coords[1]}]}
+
+    def _forecast(self, latitude, longitude, query):
+        # Deterministic, location-dependent values that fall inside the training data's ranges
+        past_days = int(query.get('past_days', 0))
+        days = past_days + int(query.get('forecast_days', self.server.days))
+        base = 18 + (abs(latitude) % 10)
+        start = date(2025, 6, 1) - timedelta(days=past_days)
+        daily = {
+            'time': [(start + timedelta(days=i)).isoformat() for i in range(days)],
+            'temperature_2m_max': [round(base + 8 + (i % 3), 1) for i in range(days)],
+            'temperature_2m_min': [round(base + (i % 2), 1) for i in range(days)],
+            'precipitation_sum': [round((longitude % 7) * (i % 4), 1) for i in range(days)],
+            'weathercode': [(0, 2, 61, 80)[i % 4] for i in range(days)],
+            'relative_humidity_2m_mean': [round(55 + (longitude % 30) + (i % 5), 1) for i in range(days)],
+        }
+        return {'latitude': latitude, 'longitude': longitude, 'daily': daily}
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--delay', type=float, default=0.0, help="seconds to sleep before each response")
+    args = parser.parse_args()
+
+    server = StubOpenMeteo((args.host, args.port), delay=args.delay)
+    print(f"Serving stub Open-Meteo on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,46 @@
+import os
+import warnings
+
+import numpy as np
+import pytest
+
+from inference import ForestEngine, check_equivalence
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='module')
+def engine():
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return ForestEngine.from_pickles(BASE_DIR)
+
+
+def test_matches_pickled_pipeline():
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        n, _, _ = check_equivalence(BASE_DIR, n_random=2000)
+    assert n == 2200 + 2000
+
+
+def test_bundle_round_trip(engine, tmp_path):
+    engine.save(str(tmp_path))
+    loaded = ForestEngine.load(str(tmp_path))
+    X = np.random.default_rng(1).uniform(0, 150, size=(50, engine.n_features))
+    np.testing.assert_array_equal(loaded.predict_proba(X), engine.predict_proba(X))
+
+
+@pytest.mark.parametrize('bad', [np.nan, np.inf, -np.inf, 1e300])
+def test_transform_rejects_unscalable_values(engine, bad):
+    row = np.full((1, engine.n_features), 50.0)
+    row[0, 0] = bad
+    with pytest.raises(ValueError):
+        engine.transform(row)
+
+
+def test_scalable_marks_the_rows_transform_rejects(engine):
+    X = np.full((4, engine.n_features), 50.0)
+    X[1, 2] = np.nan
+    X[3, 6] = 1e300
+    np.testing.assert_array_equal(engine.scalable(X), [True, False, True, False])
+    engine.transform(X[engine.scalable(X)])
@@ -0,0 +1,174 @@
+"""Rebuild model.pkl, minmaxscaler.pkl, standscaler.pkl and model_bundle/ from the dataset.
+
+    python train.py                      # search, report, write artifacts here
+    python train.py --output-dir /tmp/m  # write somewhere else
+    python train.py --dry-run            # search and report only
+
+model_bundle/ also gets the per-crop feature envelopes of --data and
+training_report.json. Every file is replaced by rename, so a running app that
+watches the artifacts never reads a half-written one.
+
+The served chain is MinMaxScaler -> StandardScaler -> forest, so the search
+cross-validates exactly that pipeline. Candidates are the forests that
+ForestEngine can serve; for each one the report has cross-validated and
+held-out accuracy next to single-row / batch latency through the engine and
+the model size. The selected model is the one with the fewest tree nodes
+whose CV accuracy is within --tolerance of the best. Node count is what the
+engine's latency and the bundle size scale with, and unlike a timing it is the
+same on every run, so the same data always yields the same artifacts.
+Latencies are medians over --repeats runs and are only reported.
+"""
+import argparse
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import GridSearchCV, StratifiedKFold, train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import MinMaxScaler, StandardScaler
+
+from envelopes import CropEnvelopes
+from inference import ARRAYS, FEATURES, ForestEngine, build_bundle, crop_dict
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+
+SEED = 42
+
+PARAM_GRID = [
+    {'clf': [RandomForestClassifier(random_state=SEED)],
+     'clf__n_estimators': [10, 25, 50, 100],
+     'clf__max_depth': [None, 12]},
+    {'clf': [ExtraTreesClassifier(random_state=SEED)],
+     'clf__n_estimators': [25, 50, 100],
+     'clf__max_depth': [None, 12]},
+]
+
+
+def load_dataset(path):
+    data = pd.read_csv(path)
+    label_of = {name.lower(): label for label, name in crop_dict.items()}
+    y = data['label'].str.lower().map(label_of)
+    if y.isna().any():
+        raise ValueError(f"Unknown crop labels: {sorted(data['label'][y.isna()].unique())}")
+    return data[FEATURES].to_numpy(dtype=np.float64), y.to_numpy(dtype=np.int64)
+
+
+def median_ms(call, repeats):
+    call()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1e3
+
+
+def time_engine(engine, X, repeats):
+    single = X[:1]
+    single_ms = median_ms(lambda: engine.top_k(single, 1), repeats)
+    batch_ms = median_ms(lambda: engine.top_k(X, 1), max(1, repeats // 20))
+    return single_ms, batch_ms
+
+
+def describe(pipeline, X_test, y_test, repeats):
+    ms, sc, clf = pipeline.named_steps['minmax'], pipeline.named_steps['standard'], pipeline.named_steps['clf']
+    engine = ForestEngine.from_sklearn(clf, ms, sc)
+    single_ms, batch_ms = time_engine(engine, X_test, repeats)
+    return {
+        'test_accuracy': round(accuracy_score(y_test, engine.predict(X_test)), 4),
+        'single_row_ms': round(single_ms, 4),
+        'batch_ms': round(batch_ms, 3),
+        'batch_rows': len(X_test),
+        'nodes': int(len(engine.feature)),
+        'bundle_bytes': int(sum(getattr(engine, name).nbytes for name in ARRAYS)),
+        'pickle_bytes': len(pickle.dumps(clf)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data', default=os.path.join(base_dir, 'Crop_recommendation.csv'))
+    parser.add_argument('--output-dir', default=base_dir)
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--jobs', type=int, default=-1, help="parallel CV fits; -1 uses all cores")
+    parser.add_argument('--tolerance', type=float, default=0.002,
+                        help="accept models whose CV accuracy is this close to the best")
+    parser.add_argument('--repeats', type=int, default=200, help="latency samples (batch uses 1/20 as many)")
+    parser.add_argument('--dry-run', action='store_true', help="report without writing artifacts")
+    args = parser.parse_args()
+
+    X, y = load_dataset(args.data)
+    # Same split as model.ipynb
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=SEED, stratify=y)
+
+    pipeline = Pipeline([('minmax', MinMaxScaler()), ('standard', StandardScaler()), ('clf', RandomForestClassifier())])
+    search = GridSearchCV(pipeline, PARAM_GRID, cv=StratifiedKFold(args.folds, shuffle=True, random_state=SEED),
+                          scoring='accuracy', n_jobs=args.jobs, refit=False)
+    start = time.perf_counter()
+    search.fit(X_train, y_train)
+    search_s = time.perf_counter() - start
+
+    candidates = []
+    for i, params in enumerate(search.cv_results_['params']):
+        fitted = pipeline.set_params(**params).fit(X_train, y_train)
+        clf = fitted.named_steps['clf']
+        candidate = {
+            'model': type(clf).__name__,
+            'n_estimators': clf.n_estimators,
+            'max_depth': clf.max_depth,
+            'cv_accuracy': round(float(search.cv_results_['mean_test_score'][i]), 4),
+            'cv_std': round(float(search.cv_results_['std_test_score'][i]), 4),
+        }
+        candidate.update(describe(fitted, X_test, y_test, args.repeats))
+        candidates.append((candidate, params))
+
+    best_cv = max(candidate['cv_accuracy'] for candidate, _ in candidates)
+    eligible = [c for c in candidates if c[0]['cv_accuracy'] >= best_cv - args.tolerance]
+    # Deterministic: smallest forest, then higher CV accuracy, then grid order
+    selected, selected_params = min(eligible, key=lambda c: (c[0]['nodes'], -c[0]['cv_accuracy']))
+    selected_by = (f"fewest nodes among candidates with CV accuracy within {args.tolerance} "
+                   f"of the best ({best_cv:.4f})")
+
+    print(f"{'model':<24}{'trees':>6}{'depth':>6}{'cv acc':>9}{'test acc':>10}{'1 row ms':>10}"
+          f"{'batch ms':>10}{'nodes':>8}{'pickle KB':>11}")
+    for candidate, _ in sorted(candidates, key=lambda c: -c[0]['cv_accuracy']):
+        mark = ' <- selected' if candidate is selected else ''
+        print(f"{candidate['model']:<24}{candidate['n_estimators']:>6}{str(candidate['max_depth']):>6}"
+              f"{candidate['cv_accuracy']:>9.4f}{candidate['test_accuracy']:>10.4f}{candidate['single_row_ms']:>10.3f}"
+              f"{candidate['batch_ms']:>10.2f}{candidate['nodes']:>8}{candidate['pickle_bytes'] / 1024:>11.0f}{mark}")
+    print(f"cross-validated {len(candidates)} candidates x {args.folds} folds in {search_s:.1f} s")
+    print(f"selected by {selected_by}")
+
+    if args.dry_run:
+        return
+
+    final = pipeline.set_params(**selected_params).fit(X_train, y_train)
+    os.makedirs(args.output_dir, exist_ok=True)
+    artifacts = {'model.pkl': final.named_steps['clf'],
+                 'minmaxscaler.pkl': final.named_steps['minmax'],
+                 'standscaler.pkl': final.named_steps['standard']}
+    for name, obj in artifacts.items():
+        path = os.path.join(args.output_dir, name)
+        with open(path + '.tmp', 'wb') as f:
+            pickle.dump(obj, f)
+        os.replace(path + '.tmp', path)
+    bundle_dir = os.path.join(args.output_dir, 'model_bundle')
+    build_bundle(args.output_dir, bundle_dir)
+    CropEnvelopes.from_csv(args.data).save(bundle_dir)
+
+    report = {'selected': selected, 'selected_by': selected_by, 'candidates': [c for c, _ in candidates],
+              'folds': args.folds, 'tolerance': args.tolerance, 'search_seconds': round(search_s, 2)}
+    path = os.path.join(bundle_dir, 'training_report.json')
+    with open(path + '.tmp', 'w') as f:
+        json.dump(report, f, indent=2)
+    os.replace(path + '.tmp', path)
+    print(f"wrote {', '.join(artifacts)} and model_bundle/ (with training_report.json) to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from cache import SingleFlight, TTLCache
+from metrics import timed
+
+GEOCODING_URL = os.environ.get('OPEN_METEO_GEOCODING_URL', 'https://geocoding-api.open-meteo.com/v1/search')
+FORECAST_URL = os.environ.get('OPEN_METEO_FORECAST_URL', 'https://api.open-meteo.com/v1/forecast')
+
+# Cities don't move, forecasts are refreshed upstream roughly hourly
+GEOCODE_TTL = float(os.environ.get('WEATHER_GEOCODE_TTL', 7 * 24 * 3600))
+FORECAST_TTL = float(os.environ.get('WEATHER_FORECAST_TTL', 15 * 60))
+
+# (connect, read) timeouts in seconds for upstream calls
+TIMEOUT = (float(os.environ.get('WEATHER_CONNECT_TIMEOUT', 3.05)), float(os.environ.get('WEATHER_READ_TIMEOUT', 10)))
+
+# Upstream calls allowed in flight per process; callers beyond that wait up to
+# WEATHER_QUEUE_TIMEOUT seconds for a slot and are then turned away
+MAX_INFLIGHT = int(os.environ.get('WEATHER_MAX_INFLIGHT', 8))
+QUEUE_TIMEOUT = float(os.environ.get('WEATHER_QUEUE_TIMEOUT', 0.05))
+
+# Forecast cache key precision; 2 decimals is about 1 km
+COORD_DECIMALS = 2
+
+# Climate features for the model: the next OUTLOOK_DAYS of temperature and
+# humidity, and rainfall over the last RAINFALL_DAYS scaled to a 30-day total
+OUTLOOK_DAYS = 14
+RAINFALL_DAYS = 92
+
+WEATHER_CODES = {
+    0: "Clear sky ☀️",
+    1: "Mainly clear 🌤️",
+    2: "Partly cloudy ⛅",
+    3: "Overcast ☁️",
+    45: "Fog 🌫️",
+    48: "Depositing rime fog 🌫️",
+    51: "Light drizzle 🌦️",
+    53: "Moderate drizzle 🌦️",
+    55: "Dense drizzle 🌧️",
+    56: "Light freezing drizzle 🌧️",
+    57: "Dense freezing drizzle 🌧️",
+    61: "Slight rain 🌧️",
+    63: "Moderate rain 🌧️",
+    65: "Heavy rain 🌧️",
+    66: "Light freezing rain 🌧️",
+    67: "Heavy freezing rain 🌧️",
+    71: "Slight snow fall 🌨️",
+    73: "Moderate snow fall 🌨️",
+    75: "Heavy snow fall 🌨️",
+    77: "Snow grains 🌨️",
+    80: "Slight rain showers 🌧️",
+    81: "Moderate rain showers 🌧️",
+    82: "Violent rain showers 🌧️",
+    85: "Slight snow showers 🌨️",
+    86: "Heavy snow showers 🌨️",
+    95: "Thunderstorm ⛈️",
+    96: "Thunderstorm with slight hail ⛈️",
+    99: "Thunderstorm with heavy hail ⛈️"
+}
+
+
+class WeatherError(Exception):
+    """An upstream lookup failed; the message is safe to show to the user."""
+
+
+class WeatherOverloaded(WeatherError):
+    """Too many upstream calls are already in flight; the caller should retry shortly."""
+
+
+class WeatherClient:
+    """Open-Meteo client with a pooled keep-alive session, TTL caches and request coalescing.
+
+    Concurrent lookups for the same city (or the same rounded coordinates) share a
+    single upstream call. Failed lookups are not cached. At most ``max_inflight``
+    upstream calls run at once; when the slots stay taken for ``queue_timeout``
+    the lookup fails fast with WeatherOverloaded instead of piling up.
+    """
+
+    def __init__(self, geocoding_url=GEOCODING_URL, forecast_url=FORECAST_URL, timeout=TIMEOUT,
+                 geocode_ttl=GEOCODE_TTL, forecast_ttl=FORECAST_TTL, pool_size=10,
+                 max_inflight=MAX_INFLIGHT, queue_timeout=QUEUE_TIMEOUT):
+        self.geocoding_url = geocoding_url
+        self.forecast_url = forecast_url
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.geocode_cache = TTLCache(maxsize=4096, ttl=geocode_ttl)
+        self.forecast_cache = TTLCache(maxsize=1024, ttl=forecast_ttl)
+        self.inflight = SingleFlight()
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='weather')
+        self.upstream_calls = 0
+        self.slots = threading.BoundedSemaphore(max_inflight)
+        self.queue_timeout = queue_timeout
+        self.shed_calls = 0
+
+    def _get_json(self, url, params, stage):
+        if not self.slots.acquire(timeout=self.queue_timeout):
+            self.shed_calls += 1
+            raise WeatherOverloaded('The weather service is busy, please try again in a moment.')
+        self.upstream_calls += 1
+        try:
+            with timed(stage):
+                response = self.session.get(url, params=params, timeout=self.timeout)
+                return response.status_code, response.json()
+        except requests.Timeout:
+            raise WeatherError('The weather service took too long to respond.')
+        except (requests.RequestException, ValueError):
+            raise WeatherError('Could not reach the weather service.')
+        finally:
+            self.slots.release()
+
+    def _cached(self, cache, key, fetch):
+        value = cache.get(key)
+        if value is None:
+            value = self.inflight.do((id(cache), key), fetch)
+            cache.put(key, value)
+        return value
+
+    def geocode(self, city):
+        """Return (latitude, longitude) of the best match for ``city``."""
+        key = city.strip().lower()
+        return self._cached(self.geocode_cache, key, lambda: self._fetch_geocode(city))
+
+    def _fetch_geocode(self, city):
+        status, data = self._get_json(self.geocoding_url, {'name': city}, 'upstream_geocode')
+        if status != 200 or not data.get('results'):
+            raise WeatherError('An error occurred while fetching the geocode data.')
+        result = data['results'][0]
+        return result['latitude'], result['longitude']
+
+    def forecast(self, latitude, longitude):
+        """Return the upstream ``daily`` forecast block for the given coordinates."""
+        key = ('forecast', round(latitude, COORD_DECIMALS), round(longitude, COORD_DECIMALS))
+        return self._cached(self.forecast_cache, key, lambda: self._fetch_forecast(*key[1:]))
+
+    def _fetch_forecast(self, latitude, longitude):
+        params = {
+            'latitude': latitude,
+            'longitude': longitude,
+            'daily': 'temperature_2m_max,temperature_2m_min,precipitation_sum,weathercode',
+            'timezone': 'auto',
+            'days': 14,
+        }
+        status, data = self._get_json(self.forecast_url, params, 'upstream_forecast')
+        if status != 200:
+            raise WeatherError(data.get('reason', 'An error occurred while fetching the weather data.'))
+        return data['daily']
+
+    def report(self, city):
+        """Geocode ``city`` and return its forecast as rows for weather_report.html."""
+        daily = self.forecast(*self.geocode(city))
+        return [
+            {
+                'date': daily['time'][i],
+                'min_temp': daily['temperature_2m_min'][i],
+                'max_temp': daily['temperature_2m_max'][i],
+                'rainfall': daily['precipitation_sum'][i],
+                'description': WEATHER_CODES.get(daily['weathercode'][i], "Unknown")
+            }
+            for i in range(len(daily['time']))
+        ]
+
+    def climate(self, latitude, longitude):
+        """Derive the model's temperature, humidity and rainfall inputs for a location.
+
+        The rainfall history and the outlook come back from one upstream call, so a
+        cold lookup holds a single in-flight slot.
+        """
+        key = ('climate', round(latitude, COORD_DECIMALS), round(longitude, COORD_DECIMALS))
+        return self._cached(self.forecast_cache, key, lambda: self._fetch_climate(*key[1:]))
+
+    def _fetch_climate(self, latitude, longitude):
+        params = {
+            'latitude': latitude,
+            'longitude': longitude,
+            'daily': 'temperature_2m_max,temperature_2m_min,relative_humidity_2m_mean,precipitation_sum',
+            'timezone': 'auto',
+            'past_days': RAINFALL_DAYS,
+            'forecast_days': OUTLOOK_DAYS,
+        }
+        status, data = self._get_json(self.forecast_url, params, 'upstream_climate')
+        if status != 200:
+            raise WeatherError(data.get('reason', 'An error occurred while fetching the weather data.'))
+        daily = data['daily']
+        # The first RAINFALL_DAYS entries are the past, the rest today and the outlook
+        highs = [t for t in daily['temperature_2m_max'][RAINFALL_DAYS:] if t is not None]
+        lows = [t for t in daily['temperature_2m_min'][RAINFALL_DAYS:] if t is not None]
+        humidity = [h for h in daily['relative_humidity_2m_mean'][RAINFALL_DAYS:] if h is not None]
+        rain = [r for r in daily['precipitation_sum'][:RAINFALL_DAYS] if r is not None]
+        if not highs or not lows or not humidity:
+            raise WeatherError('The weather service returned no usable forecast for this location.')
+        if not rain:
+            raise WeatherError('The weather service returned no rainfall history for this location.')
+        return {
+            'temperature': round((sum(highs) / len(highs) + sum(lows) / len(lows)) / 2, 2),
+            'humidity': round(sum(humidity) / len(humidity), 2),
+            'rainfall': round(sum(rain) * 30 / len(rain), 2),
+        }
+
+    def stats(self):
+        return {
+            'upstream_calls': self.upstream_calls,
+            'coalesced_calls': self.inflight.shared,
+            'shed_calls': self.shed_calls,
+            'geocode_cache': self.geocode_cache.stats(),
+            'forecast_cache': self.forecast_cache.stats(),
+        }
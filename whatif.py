@@ -0,0 +1,104 @@
+import numpy as np
+
+from inference import FEATURES, crop_dict
+
+# Grid points per swept feature when the request doesn't say
+DEFAULT_STEPS = 50
+
+# Bounds on one sweep, so a 2-D grid costs at most one 10k-row forest pass
+MAX_STEPS = 200
+MAX_POINTS = 10000
+
+
+def parse_axes(spec, bounds):
+    """Turn a sweep spec (one dict or a list of up to two) into [(feature index, values)].
+
+    Each dict names a feature and optionally min, max and steps; min and max
+    default to ``bounds``, a (2, features) array of the dataset's range.
+    """
+    specs = spec if isinstance(spec, list) else [spec]
+    if not 1 <= len(specs) <= 2 or not all(isinstance(s, dict) for s in specs):
+        raise ValueError("sweep must be one or two objects with a feature and optional min, max and steps")
+    axes = []
+    for s in specs:
+        if s.get('feature') not in FEATURES:
+            raise ValueError(f"sweep feature must be one of {', '.join(FEATURES)}")
+        i = FEATURES.index(s['feature'])
+        if any(i == j for j, _ in axes):
+            raise ValueError("sweep features must differ")
+        low = float(s.get('min', bounds[0, i]))
+        high = float(s.get('max', bounds[1, i]))
+        steps = int(s.get('steps', DEFAULT_STEPS))
+        if not 2 <= steps <= MAX_STEPS:
+            raise ValueError(f"steps must be between 2 and {MAX_STEPS}")
+        if not np.isfinite([low, high]).all():
+            raise ValueError("sweep min and max must be finite numbers")
+        if not low < high:
+            raise ValueError("sweep min must be below max")
+        axes.append((i, np.linspace(low, high, steps)))
+    if np.prod([len(values) for _, values in axes]) > MAX_POINTS:
+        raise ValueError(f"A sweep may score at most {MAX_POINTS} points")
+    return axes
+
+
+def build_grid(base, axes):
+    """Copies of the base row with the swept features replaced, in row-major grid order."""
+    shape = tuple(len(values) for _, values in axes)
+    grid = np.tile(np.asarray(base, dtype=np.float64), (int(np.prod(shape)), 1))
+    for (i, _), values in zip(axes, np.meshgrid(*[values for _, values in axes], indexing='ij')):
+        grid[:, i] = values.ravel()
+    return grid
+
+
+def label_of(crop):
+    """The class label for a crop name, ignoring case."""
+    by_name = {name.lower(): label for label, name in crop_dict.items()}
+    if str(crop).lower() not in by_name:
+        raise ValueError(f"Unknown crop {crop}")
+    return by_name[str(crop).lower()]
+
+
+def sweep(engine, base, axes, target=None):
+    """Score the whole grid in one forest pass and summarise where the recommendation changes.
+
+    One axis gives the crop at every value and each boundary between crops; two
+    give the label grid plus the share of it each crop covers. With a target
+    crop, the grid point nearest the base input that yields it is reported too.
+    """
+    base = np.asarray(base, dtype=np.float64)
+    shape = tuple(len(values) for _, values in axes)
+    proba = engine.predict_proba(build_grid(base, axes))
+    labels, _ = engine.rank(proba, 1)
+    labels = labels[:, 0]
+    names = {label: crop_dict.get(label, "Unknown") for label in np.unique(labels).tolist()}
+
+    result = {'features': [FEATURES[i] for i, _ in axes], 'values': [values.round(4).tolist() for _, values in axes],
+              'crops': names}
+    if len(axes) == 1:
+        values = axes[0][1]
+        result['labels'] = labels.tolist()
+        result['changes'] = [{'from': names[labels[j - 1]], 'to': names[labels[j]],
+                              'between': [round(float(values[j - 1]), 4), round(float(values[j]), 4)]}
+                             for j in (np.flatnonzero(labels[1:] != labels[:-1]) + 1).tolist()]
+    else:
+        grid = labels.reshape(shape)
+        result['labels'] = grid.tolist()
+        counts = dict(zip(*np.unique(labels, return_counts=True)))
+        result['share'] = {names[label]: round(int(n) / len(labels), 4) for label, n in counts.items()}
+
+    if target is not None:
+        target_label = label_of(target)
+        column = np.flatnonzero(engine.classes == target_label)
+        hits = np.flatnonzero(labels == target_label)
+        nearest = None
+        if len(hits):
+            # Distance to the base input, with each axis measured in units of its swept span
+            coords = np.stack(np.unravel_index(hits, shape), axis=1)
+            offsets = [(values[coords[:, a]] - base[i]) / (values[-1] - values[0]) for a, (i, values) in enumerate(axes)]
+            best = hits[np.argmin(np.sum(np.square(offsets), axis=0))]
+            point = np.unravel_index(best, shape)
+            nearest = {FEATURES[i]: round(float(values[p]), 4) for (i, values), p in zip(axes, point)}
+        probability = proba[:, column[0]] if len(column) else np.zeros(len(labels))
+        result['target'] = {'crop': crop_dict[target_label], 'nearest': nearest,
+                            'probability': probability.reshape(shape).round(4).tolist()}
+    return result